@@ -0,0 +1,101 @@
+"""Замена модуля ``heapq``, в которой кучей служит :class:`trees.AVLTree`.
+
+Функции повторяют сигнатуры ``heapq``, поэтому код планировщика переносится заменой импорта::
+
+    import avl_heapq as heapq
+
+    heap = heapq.heapify([])
+    heapq.heappush(heap, (deadline, task_id, task))
+    deadline, task_id, task = heapq.heappop(heap)
+
+``heap[0]``, ``len(heap)`` и ``bool(heap)`` работают как у списка-кучи; в отличие от списка,
+дерево дополнительно удаляет произвольный элемент за O(log n) и всегда обходится по порядку.
+Равные элементы извлекаются в порядке добавления.
+"""
+import heapq
+from itertools import islice
+from typing import Any, Callable, Iterable, Optional
+
+from trees import AVLTree
+
+__all__ = ['heappush', 'heappop', 'heappushpop', 'heapreplace', 'heapify', 'merge', 'nlargest', 'nsmallest']
+
+merge = heapq.merge
+
+
+def _check_heap(heap: Any) -> None:
+    """Проверка, что куча создана :func:`heapify`, а не осталась списком от ``heapq``.
+
+    :raise TypeError: ``heap`` не является :class:`AVLTree`.
+    """
+    if not isinstance(heap, AVLTree):
+        raise TypeError(f'heap must be an AVLTree (use heapify), not {type(heap).__name__}')
+
+
+def heappush(heap: AVLTree, item: Any) -> None:
+    """Добавление элемента в кучу за O(log n).
+
+    :raise TypeError: ``heap`` не является :class:`AVLTree`.
+    """
+    _check_heap(heap)
+    heap.append(item)
+
+
+def heappop(heap: AVLTree) -> Any:
+    """Извлечение наименьшего элемента за один спуск.
+
+    :raise IndexError: Куча пуста.
+    :raise TypeError: ``heap`` не является :class:`AVLTree`.
+    """
+    _check_heap(heap)
+    return heap.pop_min()
+
+
+def heappushpop(heap: AVLTree, item: Any) -> Any:
+    """Добавление элемента и извлечение наименьшего; не меняет кучу, если элемент не больше минимума.
+
+    :raise TypeError: ``heap`` не является :class:`AVLTree`.
+    """
+    _check_heap(heap)
+    if not heap or not heap.peek_min() < item:
+        return item
+    smallest = heap.pop_min()
+    heap.append(item)
+    return smallest
+
+
+def heapreplace(heap: AVLTree, item: Any) -> Any:
+    """Извлечение наименьшего элемента и добавление нового.
+
+    :raise IndexError: Куча пуста.
+    :raise TypeError: ``heap`` не является :class:`AVLTree`.
+    """
+    _check_heap(heap)
+    smallest = heap.pop_min()
+    heap.append(item)
+    return smallest
+
+
+def heapify(x: Iterable) -> AVLTree:
+    """Построение кучи из последовательности за O(n log n).
+
+    Список нельзя превратить в дерево на месте, поэтому, в отличие от ``heapq.heapify``,
+    функция возвращает кучу; дерево возвращается без изменений.
+    """
+    if isinstance(x, AVLTree):
+        return x
+    return AVLTree(x)
+
+
+def nsmallest(n: int, iterable: Iterable, key: Optional[Callable] = None) -> list:
+    """Первые ``n`` наименьших элементов; для кучи без ``key`` - обходом за O(log n + n)"""
+    if isinstance(iterable, AVLTree) and key is None:
+        return list(islice(iterable, max(n, 0)))
+    return heapq.nsmallest(n, iterable, key=key)
+
+
+def nlargest(n: int, iterable: Iterable, key: Optional[Callable] = None) -> list:
+    """Первые ``n`` наибольших элементов; для кучи без ``key`` - обратным обходом за O(log n + n)"""
+    if isinstance(iterable, AVLTree) and key is None:
+        return list(islice(reversed(iterable), max(n, 0)))
+    return heapq.nlargest(n, iterable, key=key)
@@ -0,0 +1,359 @@
+"""Замеры производительности и расхода памяти деревьев из ``trees.py`` и функций из ``recursion.py``.
+
+Каждый замер - это операция над структурой на входных данных одного вида и размера. Для операций
+дерева рядом замеряются аналоги на отсортированном списке (``bisect``) и ``sorted()``. Результаты
+печатаются таблицей и сохраняются в JSON; сравнение с JSON прошлой версии находит регрессии::
+
+    python benchmarks.py -n 1000 100000 --output before.json
+    python benchmarks.py -n 1000 100000 --compare before.json
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from bisect import bisect_left, insort
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Optional
+
+from trees import AVLTree, ArrayAVLTree
+
+RECURSION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'grokking_algorithms_se', 'chapter4_fast_sorting', 'recursion.py')
+
+WORKLOADS: dict[str, Callable[[int, random.Random], list]] = {
+    'sorted': lambda n, rng: list(range(n)),
+    'reversed': lambda n, rng: list(range(n, 0, -1)),
+    'random': lambda n, rng: rng.sample(range(n * 10), n),
+    'duplicates': lambda n, rng: [rng.randrange(max(1, n // 100)) for _ in range(n)],
+}
+
+
+@dataclass
+class Case:
+    """Замеряемая операция.
+
+    ``setup`` получает входные данные и готовит состояние (не входит в замер), возвращая замеряемую
+    функцию; та возвращает структуру, высоту которой нужно сообщить, или ``None``.
+    """
+    structure: str
+    operation: str
+    setup: Callable[[list], Callable[[], Any]]
+    quadratic: bool = False  # время растет как n**2 - замер пропускается при n > --max-quadratic
+
+
+@dataclass
+class Result:
+    """Результат замера"""
+    structure: str
+    operation: str
+    workload: str
+    n: int
+    seconds: Optional[float] = None
+    ops_per_sec: Optional[float] = None
+    peak_memory: Optional[int] = None  # байт
+    height: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> tuple[str, str, str, int]:
+        return self.structure, self.operation, self.workload, self.n
+
+
+def load_recursion() -> Any:
+    """Загрузка модуля ``recursion.py``, который лежит вне пакета"""
+    spec = importlib.util.spec_from_file_location('recursion', RECURSION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def tree_cases(tree_type: type) -> list[Case]:
+    """Операции дерева ``tree_type``"""
+    name = tree_type.__name__
+
+    def append(keys: list) -> Callable[[], Any]:
+        def run() -> Any:
+            tree = tree_type()
+            for key in keys:
+                tree.append(key)
+            return tree
+        return run
+
+    def insert(keys: list) -> Callable[[], Any]:
+        return lambda: tree_type(keys)
+
+    def delete(keys: list) -> Callable[[], Any]:
+        tree = tree_type(keys)
+
+        def run() -> None:
+            for key in keys:
+                tree.delete(key)
+        return run
+
+    def contains(keys: list) -> Callable[[], Any]:
+        tree = tree_type(keys)
+
+        def run() -> Any:
+            for key in keys:
+                key in tree
+            return tree
+        return run
+
+    def iterate(keys: list) -> Callable[[], Any]:
+        tree = tree_type(keys)
+
+        def run() -> Any:
+            for _ in tree:
+                pass
+            return tree
+        return run
+
+    def min_value(keys: list) -> Callable[[], Any]:
+        tree = tree_type(keys)
+
+        def run() -> Any:
+            for _ in keys:
+                tree.min_value()
+            return tree
+        return run
+
+    return [Case(name, 'append', append), Case(name, 'insert', insert), Case(name, 'delete', delete),
+            Case(name, 'contains', contains), Case(name, 'iterate', iterate), Case(name, 'min_value', min_value)]
+
+
+def list_cases() -> list[Case]:
+    """Те же операции на отсортированном списке: ``insort``/``bisect`` и ``sorted()``"""
+    def append(keys: list) -> Callable[[], Any]:
+        def run() -> None:
+            items = []
+            for key in keys:
+                insort(items, key)
+        return run
+
+    def insert(keys: list) -> Callable[[], Any]:
+        return lambda: sorted(keys) and None
+
+    def delete(keys: list) -> Callable[[], Any]:
+        items = sorted(keys)
+
+        def run() -> None:
+            for key in keys:
+                del items[bisect_left(items, key)]
+        return run
+
+    def contains(keys: list) -> Callable[[], Any]:
+        items = sorted(keys)
+        n = len(items)
+
+        def run() -> None:
+            for key in keys:
+                i = bisect_left(items, key)
+                i < n and items[i] == key
+        return run
+
+    def iterate(keys: list) -> Callable[[], Any]:
+        items = sorted(keys)
+
+        def run() -> None:
+            for _ in items:
+                pass
+        return run
+
+    def min_value(keys: list) -> Callable[[], Any]:
+        items = sorted(keys)
+
+        def run() -> None:
+            for _ in keys:
+                items[0]
+        return run
+
+    return [Case('bisect', 'append', append, quadratic=True), Case('sorted', 'insert', insert),
+            Case('bisect', 'delete', delete, quadratic=True), Case('bisect', 'contains', contains),
+            Case('bisect', 'iterate', iterate), Case('bisect', 'min_value', min_value)]
+
+
+def recursion_cases(recursion: Any) -> list[Case]:
+    """Функции ``recursion.py`` и ``sorted()`` как эталон для ``quick_sort``"""
+    def whole_list(function: Callable[[list], Any]) -> Callable[[list], Callable[[], Any]]:
+        def setup(keys: list) -> Callable[[], Any]:
+            items = list(keys)
+            return lambda: function(items) and None
+        return setup
+
+    def bin_search(keys: list) -> Callable[[], Any]:
+        items = sorted(keys)
+
+        def run() -> None:
+            for key in keys:
+                recursion.bin_search(items, key)
+        return run
+
+    return [Case('recursion', 'summ', whole_list(recursion.summ)),
+            Case('recursion', 'count', whole_list(recursion.count)),
+            Case('recursion', 'maximum', whole_list(recursion.maximum)),
+            Case('recursion', 'bin_search', bin_search),
+            Case('recursion', 'quick_sort', whole_list(recursion.quick_sort)),
+            Case('sorted', 'quick_sort', whole_list(sorted))]
+
+
+def tree_height(structure: Any) -> Optional[int]:
+    """Высота дерева или ``None`` для других структур"""
+    if isinstance(structure, AVLTree):
+        return AVLTree._height(structure.root)
+    if isinstance(structure, ArrayAVLTree):
+        return structure._heights[structure.root] if structure.root != -1 else 0
+    return None
+
+
+def measure(case: Case, keys: list, workload: str, repeat: int, memory: bool) -> Result:
+    """Замер операции: лучшее время из ``repeat`` запусков и пиковая память отдельного запуска.
+
+    Под ``tracemalloc`` код заметно медленнее, поэтому память замеряется в отдельном запуске;
+    ``setup`` выполняется до начала трассировки, и его структуры в пик не входят.
+    """
+    result = Result(case.structure, case.operation, workload, len(keys))
+    try:
+        best = None
+        for _ in range(repeat):
+            run = case.setup(keys)
+            gc.collect()
+            start = time.perf_counter()
+            structure = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            result.height = tree_height(structure)
+            del run, structure
+
+        result.seconds = best
+        result.ops_per_sec = len(keys) / best if best else None
+        if memory:
+            run = case.setup(keys)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                result.peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    except RecursionError:
+        result.seconds = result.ops_per_sec = result.peak_memory = None
+        result.error = 'RecursionError'
+    return result
+
+
+def memory_per_key(n: int, storage: str = 'nodes') -> float:
+    """Расход памяти дерева в пересчете на один ключ.
+
+    :param n: Количество случайных целых ключей.
+    :param storage: Способ хранения узлов: ``'nodes'`` или ``'array'``.
+    :return: Возвращает количество байт на ключ.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        keys = random.sample(range(n * 10), n)
+        tree = (ArrayAVLTree if storage == 'array' else AVLTree)(keys)
+        del keys
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(tree) == n
+    return current / n
+
+
+def compare(results: list[Result], baseline: list[dict], threshold: float) -> list[tuple[Result, float]]:
+    """Поиск регрессий относительно результатов прошлой версии.
+
+    :param results: Текущие результаты.
+    :param baseline: Результаты из JSON прошлой версии.
+    :param threshold: Допустимая доля падения ops/sec.
+    :return: Возвращает замеры, ставшие медленнее порога, и их прежние ops/sec.
+    """
+    previous = {(r['structure'], r['operation'], r['workload'], r['n']): r['ops_per_sec'] for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(result.name)
+        if old and result.ops_per_sec is not None and result.ops_per_sec < old * (1 - threshold):
+            regressions.append((result, old))
+    return regressions
+
+
+def print_result(result: Result) -> None:
+    ops = f'{result.ops_per_sec:,.0f}' if result.ops_per_sec is not None else result.error or 'skipped'
+    memory = f'{result.peak_memory / 2 ** 20:.2f}' if result.peak_memory is not None else '-'
+    height = result.height if result.height is not None else '-'
+    print(f'{result.structure:>13} {result.operation:>10} {result.workload:>10} {result.n:>9} '
+          f'{ops:>14} {memory:>10} {height:>6}', flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, nargs='+', default=[10 ** 3, 10 ** 4, 10 ** 5],
+                        help='количество ключей (до 10**7)')
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS),
+                        help='виды входных данных')
+    parser.add_argument('--repeat', type=int, default=1, help='количество запусков, берется лучшее время')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора входных данных')
+    parser.add_argument('--max-quadratic', type=int, default=10 ** 4,
+                        help='наибольшее n для квадратичных замеров (insort и удаление из списка)')
+    parser.add_argument('--no-memory', action='store_true', help='не замерять пиковую память')
+    parser.add_argument('--output', help='файл JSON для результатов')
+    parser.add_argument('--compare', help='файл JSON прошлой версии для поиска регрессий')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимая доля падения ops/sec')
+    parser.add_argument('--memory-per-key', action='store_true',
+                        help='только сравнить расход памяти на ключ для storage="nodes" и "array"')
+    args = parser.parse_args()
+
+    if args.memory_per_key:
+        print(f"{'keys':>10} {'nodes, B/key':>14} {'array, B/key':>14}")
+        for n in args.n:
+            print(f"{n:>10} {memory_per_key(n, 'nodes'):>14.1f} {memory_per_key(n, 'array'):>14.1f}")
+        return
+
+    cases = tree_cases(AVLTree) + tree_cases(ArrayAVLTree) + list_cases() + recursion_cases(load_recursion())
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'structure':>13} {'operation':>10} {'workload':>10} {'n':>9} {'ops/sec':>14} {'peak, MB':>10} "
+          f"{'height':>6}")
+    for n in args.n:
+        for workload in args.workloads:
+            keys = WORKLOADS[workload](n, rng)
+            for case in cases:
+                if case.quadratic and n > args.max_quadratic:
+                    result = Result(case.structure, case.operation, workload, n, error='skipped')
+                else:
+                    result = measure(case, keys, workload, args.repeat, not args.no_memory)
+                results.append(result)
+                print_result(result)
+
+    if args.output:
+        report = {
+            'python': sys.version,
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': [asdict(result) for result in results],
+        }
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for result, old in regressions:
+            print(f'regression: {" ".join(map(str, result.name))}: '
+                  f'{old:,.0f} -> {result.ops_per_sec:,.0f} ops/sec', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
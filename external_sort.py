@@ -0,0 +1,168 @@
+"""Внешняя сортировка слиянием для последовательностей, которые не помещаются в память.
+
+1. Вход читается кусками не длиннее ``chunk_size`` элементов (и не больше ``memory_limit`` байт);
+   каждый кусок сортируется и сбрасывается во временный файл - отсортированный отрезок.
+2. Если отрезков больше ``fan_in``, они сливаются группами в более длинные, пока не останется
+   не больше ``fan_in`` - так число одновременно открытых файлов ограничено.
+3. Оставшиеся отрезки лениво сливаются ``heapq.merge``; из каждого в памяти только один блок.
+
+Отсортированный поток передается в построение дерева или в снимок на диске::
+
+    tree = AVLTree(external_sort(stream))          # list.sort уже отсортированного входа - O(n)
+    sort_to_index(stream, 'index.avlt')            # снимок без узлов в памяти
+    index = AVLTree.load('index.avlt', mapped=True)
+
+Вход, уместившийся в один кусок, сортируется в памяти без временных файлов.
+"""
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+from trees import AVLTree
+
+__all__ = ['external_sort', 'sort_to_index']
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # элементов в одном отрезке
+DEFAULT_FAN_IN = 64  # отрезков, сливаемых за один проход
+MAX_BLOCK_SIZE = 1 << 12  # элементов в одном блоке отрезка на диске
+
+
+def external_sort(iterable: Iterable, *, key: Optional[Callable] = None, reverse: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, memory_limit: Optional[int] = None,
+                  fan_in: int = DEFAULT_FAN_IN,
+                  temp_dir: Union[str, os.PathLike, None] = None) -> Iterator:
+    """Ленивая сортировка последовательности с ограниченной памятью.
+
+    Сортировка устойчива, как ``sorted``. Временные файлы удаляются, когда генератор
+    исчерпан или закрыт.
+
+    :param iterable: Последовательность или генератор сравнимых объектов, которые можно сериализовать ``pickle``.
+    :param key: Функция ключа, как в ``sorted``.
+    :param reverse: Сортировка по убыванию.
+    :param chunk_size: Наибольшее количество элементов в памяти при чтении и при слиянии.
+    :param memory_limit: Наибольший размер куска в байтах по оценке ``sys.getsizeof``
+        (без вложенных объектов); ``None`` - ограничение только по ``chunk_size``.
+    :param fan_in: Наибольшее количество отрезков, сливаемых за один проход.
+    :param temp_dir: Каталог для временных файлов (по умолчанию - системный).
+    :raise ValueError: ``chunk_size``, ``memory_limit`` или ``fan_in`` слишком малы.
+    :return: Возвращает генератор элементов в отсортированном порядке.
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+    if memory_limit is not None and memory_limit < 1:
+        raise ValueError('memory_limit must be positive')
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2')
+    return _external_sort(iter(iterable), key, reverse, chunk_size, memory_limit, fan_in, temp_dir)
+
+
+def sort_to_index(iterable: Iterable, path: Union[str, os.PathLike], **kwargs: Any) -> int:
+    """Внешняя сортировка чисел прямо в снимок сбалансированного дерева (см. :meth:`AVLTree.dump_sorted`).
+
+    :param iterable: Последовательность ``int`` или ``float``.
+    :param path: Путь к файлу снимка.
+    :param kwargs: Параметры :func:`external_sort`, кроме ``key`` и ``reverse``.
+    :raise TypeError: Передан ``key`` или ``reverse``, или в последовательности есть не числа.
+    :return: Возвращает количество записанных ключей.
+    """
+    if 'key' in kwargs or 'reverse' in kwargs:
+        raise TypeError('snapshot keys are always sorted ascending by value')
+    return AVLTree.dump_sorted(external_sort(iterable, **kwargs), path)
+
+
+def _external_sort(iterator: Iterator, key: Optional[Callable], reverse: bool, chunk_size: int,
+                   memory_limit: Optional[int], fan_in: int,
+                   temp_dir: Union[str, os.PathLike, None]) -> Iterator:
+    """Генератор внешней сортировки; параметры проверены :func:`external_sort`"""
+    chunk, exhausted = _read_chunk(iterator, chunk_size, memory_limit)
+    chunk.sort(key=key, reverse=reverse)
+    if exhausted:
+        yield from chunk
+        return
+
+    # при слиянии в памяти по блоку из каждого отрезка - всего не больше chunk_size элементов
+    block_size = max(1, min(MAX_BLOCK_SIZE, chunk_size // fan_in))
+    with tempfile.TemporaryDirectory(prefix='external_sort_', dir=temp_dir) as directory:
+        runs = [_write_run(_run_path(directory, 0), chunk, block_size)]
+        del chunk
+        while not exhausted:
+            chunk, exhausted = _read_chunk(iterator, chunk_size, memory_limit)
+            if chunk:
+                chunk.sort(key=key, reverse=reverse)
+                runs.append(_write_run(_run_path(directory, len(runs)), chunk, block_size))
+            del chunk
+
+        created = len(runs)
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                group = runs[i:i + fan_in]
+                readers = [_read_run(run) for run in group]
+                merged.append(_write_run(_run_path(directory, created),
+                                         heapq.merge(*readers, key=key, reverse=reverse), block_size))
+                created += 1
+                for run in group:
+                    os.remove(run)
+            runs = merged
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key, reverse=reverse)
+
+
+def _run_path(directory: str, number: int) -> str:
+    """Путь к файлу отрезка с номером ``number``"""
+    return os.path.join(directory, f'{number}.run')
+
+
+def _read_chunk(iterator: Iterator, chunk_size: int, memory_limit: Optional[int]) -> tuple[list, bool]:
+    """Чтение очередного куска входа.
+
+    :return: Возвращает кусок и признак того, что вход исчерпан.
+    """
+    if memory_limit is None:
+        chunk = list(islice(iterator, chunk_size))
+        return chunk, len(chunk) < chunk_size
+
+    chunk = []
+    size = sys.getsizeof(chunk)
+    for item in iterator:
+        chunk.append(item)
+        size += sys.getsizeof(item) + 8  # объект и ссылка на него в списке
+        if len(chunk) == chunk_size or size >= memory_limit:
+            return chunk, False
+    return chunk, True
+
+
+def _write_run(path: str, items: Iterable, block_size: int) -> str:
+    """Запись отсортированного отрезка блоками по ``block_size`` элементов.
+
+    :return: Возвращает путь к файлу отрезка.
+    """
+    iterator = iter(items)
+    with open(path, 'wb') as file:
+        for block in iter(lambda: list(islice(iterator, block_size)), []):
+            pickle.dump(block, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator:
+    """Чтение отрезка по одному блоку"""
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                block = pickle.load(file)
+            except EOFError:
+                return
+            yield from block
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    numbers = (random.randint(-10 ** 9, 10 ** 9) for _ in range(10 ** 6))
+    start = time.perf_counter()
+    result = list(external_sort(numbers, chunk_size=10 ** 5))
+    print(f'{len(result)} numbers: {time.perf_counter() - start:.2f} s', result == sorted(result))
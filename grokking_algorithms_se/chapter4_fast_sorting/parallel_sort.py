@@ -0,0 +1,211 @@
+"""Параллельная сортировка выборкой (sample sort) числовых последовательностей на нескольких процессах.
+
+1. Вход копируется в блок разделяемой памяти; процессы получают только имена блоков и границы.
+2. Из случайной выборки, отсортированной ``quick_sort``, берутся разделители - порядковые
+   статистики выборки, как медиана трех у опорного элемента ``quick_sort``, только для p частей.
+3. Каждый процесс считает, сколько элементов его куска попадает в каждую корзину; по этим
+   счетчикам вычисляются места корзин в выходном блоке.
+4. Процессы раскладывают свои куски по корзинам выходного блока, затем сортируют по корзине.
+   Корзины идут по возрастанию, поэтому выходной блок сразу отсортирован, слияние не нужно.
+
+С NumPy куски обрабатываются векторно и сортируются ``numpy.ndarray.sort``, без него - через
+``memoryview`` и ``quick_sort``. Короткие и нечисловые последовательности сортируются в текущем процессе.
+"""
+import os
+import random
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from multiprocessing import shared_memory
+from typing import Any, Callable
+
+from recursion import quick_sort
+
+try:
+    import numpy
+except ImportError:  # NumPy необязателен: без него процессы работают с memoryview
+    numpy = None
+
+SERIAL_THRESHOLD = 1 << 16  # более короткие последовательности сортируются без процессов
+OVERSAMPLING = 64  # размер выборки на одну корзину
+
+
+def parallel_sort(data: Any, workers: int | None = None, threshold: int = SERIAL_THRESHOLD) -> Any:
+    """Параллельная сортировка числовой последовательности.
+
+    :param data: Список или ``array.array`` чисел, массив NumPy.
+    :param workers: Количество процессов (по умолчанию - количество ядер).
+    :param threshold: Последовательности короче сортируются в текущем процессе.
+    :return: Возвращает новый отсортированный массив NumPy для массива NumPy, иначе - список.
+    """
+    workers = workers or os.cpu_count() or 1
+    is_ndarray = numpy is not None and isinstance(data, numpy.ndarray)
+    if is_ndarray:
+        values = data.ravel()
+        fmt = values.dtype.str
+        numeric = values.dtype.kind in 'biuf'
+    else:
+        values = data if isinstance(data, array) else _to_array(data)
+        fmt = values.typecode if values is not None else None
+        numeric = values is not None and fmt in 'bBhHiIlLqQfd'
+        if numeric and numpy is not None:
+            values = numpy.frombuffer(values, dtype=numpy.dtype(fmt))
+            fmt = values.dtype.str
+
+    n = len(values) if values is not None else len(data)
+    if workers < 2 or n < max(threshold, 2 * workers) or not numeric:
+        if is_ndarray:
+            return numpy.sort(values)
+        return quick_sort(list(data))
+
+    use_numpy = numpy is not None
+    itemsize = numpy.dtype(fmt).itemsize if use_numpy else array(fmt).itemsize
+    source = shared_memory.SharedMemory(create=True, size=max(1, n * itemsize))
+    target = shared_memory.SharedMemory(create=True, size=max(1, n * itemsize))
+    try:
+        _with_views(_fill, (source.name,), fmt, n, use_numpy, values)
+        splitters = _choose_splitters(values, workers)
+        buckets = len(splitters) + 1
+        chunks = [(n * i // workers, n * (i + 1) // workers) for i in range(workers)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(_with_views, [_count] * workers, [(source.name,)] * workers,
+                                   [fmt] * workers, [n] * workers, [use_numpy] * workers,
+                                   [(lo, hi, splitters) for lo, hi in chunks]))
+
+            # корзина b куска c начинается после корзин 0..b-1 всех кусков и корзины b кусков 0..c-1
+            bucket_sizes = [sum(chunk_counts[b] for chunk_counts in counts) for b in range(buckets)]
+            bucket_starts = [0, *accumulate(bucket_sizes)]
+            offsets = []
+            for c in range(workers):
+                offsets.append([bucket_starts[b] + sum(counts[prev][b] for prev in range(c)) for b in range(buckets)])
+
+            list(pool.map(_with_views, [_scatter] * workers, [(source.name, target.name)] * workers,
+                          [fmt] * workers, [n] * workers, [use_numpy] * workers,
+                          [(lo, hi, splitters, chunk_offsets) for (lo, hi), chunk_offsets in zip(chunks, offsets)]))
+            list(pool.map(_with_views, [_sort_range] * buckets, [(target.name,)] * buckets,
+                          [fmt] * buckets, [n] * buckets, [use_numpy] * buckets,
+                          [(bucket_starts[b], bucket_starts[b + 1]) for b in range(buckets)]))
+
+        result = _with_views(_read, (target.name,), fmt, n, use_numpy, None)
+    finally:
+        for block in (source, target):
+            block.close()
+            block.unlink()
+    if is_ndarray or not use_numpy:
+        return result
+    return result.tolist()
+
+
+def _to_array(data: Any) -> array | None:
+    """Упаковка чисел в ``array.array`` без изменения их типа.
+
+    :return: Возвращает массив 'q' для 64-битных целых, 'd' - для ``float``, иначе ``None``
+        (в том числе для ``bool`` и других подклассов ``int``, которые массив превратил бы в ``int``).
+    """
+    try:
+        values = array('q', data)
+    except OverflowError:
+        return None
+    except TypeError:
+        if all(type(value) is float for value in data):
+            return array('d', data)
+        return None
+    return values if all(type(value) is int for value in data) else None
+
+
+def _choose_splitters(values: Any, workers: int) -> list:
+    """Разделители корзин - равноотстоящие порядковые статистики случайной выборки.
+
+    :return: Возвращает возрастающий список без повторов; корзин на одну больше, чем разделителей.
+    """
+    n = len(values)
+    sample = [values[i] for i in random.sample(range(n), min(n, OVERSAMPLING * workers))]
+    sample = quick_sort([value.item() if hasattr(value, 'item') else value for value in sample])
+    splitters = []
+    for i in range(1, workers):
+        splitter = sample[i * len(sample) // workers]
+        if not splitters or splitters[-1] < splitter:
+            splitters.append(splitter)
+    return splitters
+
+
+def _with_views(function: Callable, names: tuple[str, ...], fmt: str, n: int, use_numpy: bool, args: Any) -> Any:
+    """Вызов ``function`` с представлениями блоков разделяемой памяти в виде массивов.
+
+    Представления живут только во время вызова: блок нельзя закрыть, пока на него есть ссылки.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        if use_numpy:
+            views = [numpy.ndarray((n,), dtype=fmt, buffer=block.buf) for block in blocks]
+        else:
+            views = [block.buf[:n * array(fmt).itemsize].cast(fmt) for block in blocks]
+        result = function(*views, args)
+        del views
+        return result
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def _fill(view: Any, values: Any) -> None:
+    """Копирование входа в разделяемую память"""
+    view[:] = values
+
+
+def _read(view: Any, _: Any) -> Any:
+    """Копирование результата из разделяемой памяти"""
+    return view.copy() if numpy is not None and isinstance(view, numpy.ndarray) else view.tolist()
+
+
+def _count(view: Any, args: tuple) -> list[int]:
+    """Количество элементов куска view[lo:hi] в каждой корзине"""
+    lo, hi, splitters = args
+    if numpy is not None and isinstance(view, numpy.ndarray):
+        ids = numpy.searchsorted(numpy.asarray(splitters, dtype=view.dtype), view[lo:hi], side='right')
+        return numpy.bincount(ids, minlength=len(splitters) + 1).tolist()
+    counts = [0] * (len(splitters) + 1)
+    for value in view[lo:hi]:
+        counts[bisect_right(splitters, value)] += 1
+    return counts
+
+
+def _scatter(source: Any, target: Any, args: tuple) -> None:
+    """Раскладка куска source[lo:hi] по корзинам target начиная с мест ``offsets``"""
+    lo, hi, splitters, offsets = args
+    if numpy is not None and isinstance(source, numpy.ndarray):
+        chunk = source[lo:hi]
+        ids = numpy.searchsorted(numpy.asarray(splitters, dtype=source.dtype), chunk, side='right')
+        order = numpy.argsort(ids, kind='stable')
+        grouped = chunk[order]
+        position = 0
+        for bucket, size in enumerate(numpy.bincount(ids, minlength=len(splitters) + 1).tolist()):
+            target[offsets[bucket]:offsets[bucket] + size] = grouped[position:position + size]
+            position += size
+        return
+    positions = list(offsets)
+    for value in source[lo:hi]:
+        bucket = bisect_right(splitters, value)
+        target[positions[bucket]] = value
+        positions[bucket] += 1
+
+
+def _sort_range(view: Any, args: tuple) -> None:
+    """Сортировка корзины view[lo:hi] на месте"""
+    lo, hi = args
+    if numpy is not None and isinstance(view, numpy.ndarray):
+        view[lo:hi].sort()
+        return
+    view[lo:hi] = array(view.format, quick_sort(view[lo:hi].tolist()))
+
+
+if __name__ == '__main__':
+    import time
+
+    numbers = [random.randint(-10 ** 9, 10 ** 9) for _ in range(10 ** 6)]
+    for processes in (1, os.cpu_count() or 1):
+        start = time.perf_counter()
+        result = parallel_sort(numbers, workers=processes, threshold=0)
+        print(f'{processes} workers: {time.perf_counter() - start:.2f} s', result == sorted(numbers))
@@ -1,56 +1,210 @@
-def summ(array: list) -> int:
-    """Рекурсивная функция, суммирующая элементы в списке"""
-    if not array:  # if _list == []:
-        return 0
-    else:
-        return array[0] + summ(array[1:])
+from typing import Any, Callable
 
+INSERTION_SORT_THRESHOLD = 16  # отрезки не длиннее сортируются вставками
+LEAF_SIZE = 32  # отрезки не длиннее агрегируются циклом, без деления пополам
 
-def count(array: list) -> int:
-    """Рекурсивная функция, возвращающая количество элементов в списке"""
-    if not array:
-        return 0
-    else:
-        return 1 + count(array[1:])
 
+def _bounds(array: list, lo: int, hi: int | None) -> tuple[int, int]:
+    """Проверка границ отрезка array[lo:hi]; ``hi=None`` - до конца списка.
 
-def maximum(array: list) -> int | None:
-    """Рекурсивная функция, возвращающая максимальное """
-    if not array:
+    :raise ValueError: Не выполнено 0 <= lo <= hi <= len(array).
+    """
+    if lo < 0:
+        raise ValueError('lo must be non-negative')
+    if hi is None:
+        hi = len(array)
+    if not lo <= hi <= len(array):
+        raise ValueError(f'bounds [{lo}:{hi}] are outside of a list of length {len(array)}')
+    return lo, hi
+
+
+def summ(array: list, lo: int = 0, hi: int | None = None) -> int:
+    """Рекурсивная функция, суммирующая элементы array[lo:hi].
+
+    Отрезок делится пополам по индексам без срезов, поэтому глубина рекурсии - O(log n).
+    """
+    lo, hi = _bounds(array, lo, hi)
+    if hi - lo <= LEAF_SIZE:
+        total = 0
+        for i in range(lo, hi):
+            total += array[i]
+        return total
+    middle = (lo + hi) // 2
+    return summ(array, lo, middle) + summ(array, middle, hi)
+
+
+def count(array: list, lo: int = 0, hi: int | None = None) -> int:
+    """Количество элементов в array[lo:hi]"""
+    lo, hi = _bounds(array, lo, hi)
+    return hi - lo
+
+
+def maximum(array: list, lo: int = 0, hi: int | None = None) -> Any | None:
+    """Рекурсивная функция, возвращающая максимальный элемент array[lo:hi] (``None`` для пустого отрезка).
+
+    Отрезок делится пополам по индексам без срезов, поэтому глубина рекурсии - O(log n).
+    """
+    lo, hi = _bounds(array, lo, hi)
+    if hi <= lo:
         return None
-    else:
-        _max = array[0]
-        _max_in_list = maximum(array[1:])
-        if _max_in_list and _max_in_list > _max:
-            _max = _max_in_list
+    if hi - lo <= LEAF_SIZE:
+        _max = array[lo]
+        for i in range(lo + 1, hi):
+            if _max < array[i]:
+                _max = array[i]
         return _max
+    middle = (lo + hi) // 2
+    left, right = maximum(array, lo, middle), maximum(array, middle, hi)
+    return right if left < right else left
 
 
-def bin_search(sorted_list: list, number_to_find: int) -> True:
-    """Рекурсивная функция бинарного поиска числа"""
-    if sorted_list[0] == number_to_find:
-        return True
-    elif len(sorted_list) == 1 and sorted_list[0] != number_to_find:
-        return False
-    else:
-        middle = sorted_list[len(sorted_list) // 2]
-        if middle == number_to_find:
-            return True
-        elif middle < number_to_find:
-            return bin_search(sorted_list[len(sorted_list) // 2:], number_to_find)
+def bisect_left(sorted_list: list, x: Any, lo: int = 0, hi: int | None = None, key: Callable | None = None) -> int:
+    """Бинарный поиск позиции вставки ``x`` перед всеми равными ему элементами.
+
+    :param key: Функция ключа, применяемая к элементам списка (но не к ``x``), как в ``bisect``.
+    """
+    lo, hi = _bounds(sorted_list, lo, hi)
+    while lo < hi:
+        middle = (lo + hi) // 2
+        item = sorted_list[middle] if key is None else key(sorted_list[middle])
+        if item < x:
+            lo = middle + 1
+        else:
+            hi = middle
+    return lo
+
+
+def bisect_right(sorted_list: list, x: Any, lo: int = 0, hi: int | None = None, key: Callable | None = None) -> int:
+    """Бинарный поиск позиции вставки ``x`` после всех равных ему элементов.
+
+    :param key: Функция ключа, применяемая к элементам списка (но не к ``x``), как в ``bisect``.
+    """
+    lo, hi = _bounds(sorted_list, lo, hi)
+    while lo < hi:
+        middle = (lo + hi) // 2
+        item = sorted_list[middle] if key is None else key(sorted_list[middle])
+        if x < item:
+            hi = middle
         else:
-            return bin_search(sorted_list[:len(sorted_list) // 2], number_to_find)
+            lo = middle + 1
+    return lo
+
+
+def bin_search(sorted_list: list, number_to_find: Any, lo: int = 0, hi: int | None = None) -> bool:
+    """Бинарный поиск числа в отсортированном sorted_list[lo:hi] по границам индексов"""
+    lo, hi = _bounds(sorted_list, lo, hi)
+    i = bisect_left(sorted_list, number_to_find, lo, hi)
+    return i < hi and sorted_list[i] == number_to_find
+
 
+def quick_sort(array: list, key: Callable | None = None, reverse: bool = False) -> list:
+    """Быстрая сортировка списка на месте (интроспективная); возвращает тот же список.
 
-def quick_sort(array: list) -> list:
-    """Рекурсивная функция сортировки списка (быстрая сортировка)"""
-    if len(array) < 2:
+    Опорный элемент - медиана первого, среднего и последнего элементов; разбиение Хоара
+    распределяет равные опорному элементы по обеим частям, поэтому дубликаты сохраняются
+    и не замедляют сортировку. Короткие отрезки досортировываются вставками, а если глубина
+    рекурсии превышает 2·log2(n), отрезок сортируется кучей - худший случай O(n log n).
+    Рекурсия идет только в меньшую часть, поэтому стек - O(log n).
+
+    :param key: Функция ключа; с ней сортировка устойчива, как ``list.sort``.
+    :param reverse: Сортировка по убыванию; устойчива, как у ``sorted``, и без ``key``.
+    """
+    depth_limit = 2 * len(array).bit_length()
+    if key is None and not reverse:
+        _introsort(array, 0, len(array), depth_limit)
         return array
-    else:
-        pivot = array[0]
-        less = [i for i in array[1:] if i < pivot]
-        greater = [i for i in array[1:] if i > pivot]
-        return quick_sort(less) + [pivot] + quick_sort(greater)
+
+    # номер в паре делает ключи различными: сортировка устойчива и не сравнивает сами элементы;
+    # при reverse номера идут со знаком минус, поэтому после разворота равные сохраняют порядок
+    sign = -1 if reverse else 1
+    decorated = [(k, sign * i) for i, k in enumerate(array if key is None else map(key, array))]
+    _introsort(decorated, 0, len(decorated), depth_limit)
+    if reverse:
+        decorated.reverse()
+    array[:] = [array[sign * i] for _, i in decorated]
+    return array
+
+
+def _introsort(array: list, lo: int, hi: int, depth: int) -> None:
+    """Интроспективная сортировка отрезка array[lo:hi]"""
+    while hi - lo > INSERTION_SORT_THRESHOLD:
+        if depth == 0:
+            _heap_sort(array, lo, hi)
+            return
+        depth -= 1
+        split = _partition(array, lo, hi)
+        if split - lo < hi - split:
+            _introsort(array, lo, split, depth)
+            lo = split
+        else:
+            _introsort(array, split, hi, depth)
+            hi = split
+    _insertion_sort(array, lo, hi)
+
+
+def _partition(array: list, lo: int, hi: int) -> int:
+    """Разбиение Хоара отрезка array[lo:hi] (не короче трех элементов) по медиане трех.
+
+    :return: Индекс ``split``: элементы array[lo:split] не больше элементов array[split:hi], обе части непусты.
+    """
+    middle = (lo + hi - 1) // 2
+    last = hi - 1
+    if array[middle] < array[lo]:
+        array[middle], array[lo] = array[lo], array[middle]
+    if array[last] < array[lo]:
+        array[last], array[lo] = array[lo], array[last]
+    if array[last] < array[middle]:
+        array[last], array[middle] = array[middle], array[last]
+    pivot = array[middle]
+
+    i, j = lo - 1, hi
+    while True:
+        i += 1
+        while array[i] < pivot:
+            i += 1
+        j -= 1
+        while pivot < array[j]:
+            j -= 1
+        if i >= j:
+            return j + 1
+        array[i], array[j] = array[j], array[i]
+
+
+def _insertion_sort(array: list, lo: int, hi: int) -> None:
+    """Сортировка вставками отрезка array[lo:hi]"""
+    for i in range(lo + 1, hi):
+        item = array[i]
+        j = i
+        while j > lo and item < array[j - 1]:
+            array[j] = array[j - 1]
+            j -= 1
+        array[j] = item
+
+
+def _heap_sort(array: list, lo: int, hi: int) -> None:
+    """Пирамидальная сортировка отрезка array[lo:hi]"""
+    size = hi - lo
+    for root in range(size // 2 - 1, -1, -1):
+        _sift_down(array, lo, root, size)
+    for end in range(size - 1, 0, -1):
+        array[lo], array[lo + end] = array[lo + end], array[lo]
+        _sift_down(array, lo, 0, end)
+
+
+def _sift_down(array: list, lo: int, root: int, size: int) -> None:
+    """Просеивание элемента вниз в куче из ``size`` элементов, начинающейся с индекса ``lo``"""
+    item = array[lo + root]
+    while True:
+        child = 2 * root + 1
+        if child >= size:
+            break
+        if child + 1 < size and array[lo + child] < array[lo + child + 1]:
+            child += 1
+        if not item < array[lo + child]:
+            break
+        array[lo + root] = array[lo + child]
+        root = child
+    array[lo + root] = item
 
 
 if __name__ == '__main__':
@@ -58,4 +212,6 @@ if __name__ == '__main__':
     print(count([1, 3, 4, 1]))
     print(maximum([-3, -2, -1]))
     print(bin_search([1, 2, 4, 6, 11, 13, 58, 192], 192))
-    print(quick_sort([4, 12, -48, 0, 1]))
+    print(bisect_left([1, 2, 4, 4, 6], 4), bisect_right([1, 2, 4, 4, 6], 4))
+    print(quick_sort([4, 12, -48, 0, 1, 4]))
+    print(quick_sort(['bb', 'a', 'ccc'], key=len, reverse=True))
@@ -0,0 +1,59 @@
+import random
+import unittest
+from array import array
+from unittest import mock
+
+import parallel_sort
+from parallel_sort import parallel_sort as psort
+
+
+class TestParallelSort(unittest.TestCase):
+    def test_serial_fallback(self):
+        values = [random.randint(-1000, 1000) for _ in range(500)]
+        original = list(values)
+        with mock.patch.object(parallel_sort, 'ProcessPoolExecutor') as pool:
+            self.assertEqual(psort(values, workers=1, threshold=0), sorted(values))
+            self.assertEqual(psort(values, workers=4), sorted(values))  # короче порога
+            words = [str(value) for value in values]
+            self.assertEqual(psort(words, workers=2, threshold=0), sorted(words))
+            flags = [True, False] * 100
+            result = psort(flags, workers=2, threshold=0)
+            self.assertEqual(result, sorted(flags))
+            self.assertTrue(all(type(flag) is bool for flag in result))  # bool не превращаются в int
+            self.assertEqual(psort([], workers=2, threshold=0), [])
+            pool.assert_not_called()
+        self.assertEqual(values, original)  # вход не изменяется
+
+    def _check_workers(self):
+        ints = [random.randint(-10 ** 12, 10 ** 12) for _ in range(3000)]
+        floats = [random.uniform(-1, 1) for _ in range(3000)]
+        duplicates = [random.randint(0, 3) for _ in range(3000)]
+        executor = parallel_sort.ProcessPoolExecutor
+        with mock.patch.object(parallel_sort, 'ProcessPoolExecutor', wraps=executor) as pool:
+            for values in (ints, floats, duplicates, list(range(3000, 0, -1))):
+                result = psort(values, workers=2, threshold=0)
+                self.assertEqual(result, sorted(values))
+                self.assertTrue(all(type(a) is type(b) for a, b in zip(result, sorted(values))))
+            for typecode, values in (('q', ints), ('d', floats)):
+                self.assertEqual(psort(array(typecode, values), workers=3, threshold=0), sorted(values))
+            self.assertEqual(pool.call_count, 6)
+
+    def test_workers_numpy(self):
+        if parallel_sort.numpy is None:
+            self.skipTest('NumPy is not installed')
+        self._check_workers()
+        numpy = parallel_sort.numpy
+        for values in (numpy.random.randint(-1000, 1000, 3000), numpy.random.rand(3000),
+                       numpy.random.rand(50, 60)):
+            result = psort(values, workers=2, threshold=0)
+            self.assertIsInstance(result, numpy.ndarray)
+            self.assertEqual(result.dtype, values.dtype)
+            self.assertEqual(result.tolist(), sorted(values.ravel().tolist()))
+
+    def test_workers_without_numpy(self):
+        with mock.patch.object(parallel_sort, 'numpy', None):
+            self._check_workers()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import bisect
+import random
+import unittest
+
+import recursion
+from recursion import bin_search, bisect_left, bisect_right, count, maximum, quick_sort, summ
+
+
+class TestRecursion(unittest.TestCase):
+    def test_aggregates(self):
+        values = [random.randint(-1000, 1000) for _ in range(1000)]
+        self.assertEqual(summ(values), sum(values))
+        self.assertEqual(count(values), len(values))
+        self.assertEqual(maximum(values), max(values))
+        for lo, hi in ((0, 0), (3, 3), (5, 6), (10, 500), (100, None), (999, 1000), (1000, 1000)):
+            part = values[lo:hi]
+            self.assertEqual(summ(values, lo, hi), sum(part))
+            self.assertEqual(count(values, lo, hi), len(part))
+            self.assertEqual(maximum(values, lo, hi), max(part, default=None))
+        self.assertEqual((summ([]), count([]), maximum([])), (0, 0, None))
+
+        # деление по индексам пополам: длинный отсортированный список не исчерпывает стек
+        long = list(range(100000))
+        self.assertEqual(summ(long), sum(long))
+        self.assertEqual(maximum(long), long[-1])
+
+        for lo, hi in ((-1, None), (0, 1001), (0, -1), (600, 400), (1001, None)):
+            for function in (summ, count, maximum):
+                with self.assertRaises(ValueError):
+                    function(values, lo, hi)
+            for function in (bisect_left, bisect_right, bin_search):
+                with self.assertRaises(ValueError):
+                    function(sorted(values), 0, lo, hi)
+        with self.assertRaises(ValueError):
+            count([1, 2, 3], 0, 10)
+
+    def test_bisect(self):
+        values = sorted(random.randint(0, 50) for _ in range(300))
+        for x in range(-2, 53):
+            self.assertEqual(bisect_left(values, x), bisect.bisect_left(values, x))
+            self.assertEqual(bisect_right(values, x), bisect.bisect_right(values, x))
+            self.assertEqual(bisect_left(values, x, 10, 200), bisect.bisect_left(values, x, 10, 200))
+            self.assertEqual(bisect_right(values, x, 10, 200), bisect.bisect_right(values, x, 10, 200))
+            self.assertEqual(bin_search(values, x), x in values)
+            self.assertEqual(bin_search(values, x, 10, 200), x in values[10:200])
+
+        words = sorted(['a', 'bb', 'cc', 'ddd', 'eeee'], key=len)
+        self.assertEqual(bisect_left(words, 2, key=len), 1)
+        self.assertEqual(bisect_right(words, 2, key=len), 3)
+        self.assertEqual(bisect_left([], 1), 0)
+        self.assertFalse(bin_search([], 1))
+
+    def test_quick_sort(self):
+        cases = [
+            [],
+            [1],
+            [random.randint(-10 ** 6, 10 ** 6) for _ in range(5000)],
+            [random.randint(0, 5) for _ in range(5000)],  # много дубликатов
+            [7] * 3000,
+            list(range(5000)),  # отсортированный вход длиннее предела рекурсии
+            list(range(5000, 0, -1)),
+            [random.random() for _ in range(17)],
+        ]
+        for values in cases:
+            array = list(values)
+            self.assertIs(quick_sort(array), array)  # сортировка на месте
+            self.assertEqual(array, sorted(values))
+            self.assertEqual(quick_sort(list(values), reverse=True), sorted(values, reverse=True))
+
+    def test_quick_sort_key(self):
+        pairs = [(random.randint(0, 10), i) for i in range(2000)]
+        for reverse in (False, True):
+            expected = sorted(pairs, key=lambda pair: pair[0], reverse=reverse)
+            self.assertEqual(quick_sort(list(pairs), key=lambda pair: pair[0], reverse=reverse), expected)
+        words = ['bb', 'a', 'ccc', 'dd', 'e']
+        self.assertEqual(quick_sort(list(words), key=len, reverse=True), ['ccc', 'bb', 'dd', 'a', 'e'])
+        self.assertEqual(quick_sort([1, 1.0, True], reverse=True), sorted([1, 1.0, True], reverse=True))
+        self.assertEqual([type(x) for x in quick_sort([1, 1.0, True, 0, 2], reverse=True)],
+                         [int, int, float, bool, int])
+        # с key сами элементы не сравниваются
+        objects = [object() for _ in range(50)]
+        self.assertEqual(quick_sort(list(objects), key=lambda item: 0), objects)
+
+    def test_heap_sort_fallback(self):
+        values = [random.randint(-100, 100) for _ in range(1000)]
+        array = list(values)
+        recursion._introsort(array, 0, len(array), 0)  # нулевой запас глубины сразу ведет к пирамидальной сортировке
+        self.assertEqual(array, sorted(values))
+
+        array = list(values)
+        recursion._heap_sort(array, 100, 900)
+        self.assertEqual(array[:100], values[:100])
+        self.assertEqual(array[100:900], sorted(values[100:900]))
+        self.assertEqual(array[900:], values[900:])
+
+        # малый запас глубины: после нескольких разбиений части досортировываются кучей
+        array = list(values)
+        recursion._introsort(array, 0, len(array), 3)
+        self.assertEqual(array, sorted(values))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,24 @@
+import asyncio
+import bisect
+import heapq
+import io
+import json
+import os
 import random
+import tempfile
+import threading
 import unittest
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
 
-from trees import AVLTree
+import avl_heapq
+import benchmarks
+import external_sort
+import trees
+from trees import (AVLTree, ArrayAVLTree, AVLTreeMap, AVLMultiset, ConcurrentAVLTree, MappedAVLTree,
+                   PersistentAVLTree)
 
 
 class TestAVLTree(unittest.TestCase):
@@ -37,6 +54,846 @@ class TestAVLTree(unittest.TestCase):
         self.assertEqual(tree.root.right.right.left, None)
         self.assertEqual(tree.root.right.right.right, None)
 
+    def _check_invariants(self, node):
+        """Проверка высот и баланса поддерева; возвращает его высоту"""
+        if node is None:
+            return 0
+        left = self._check_invariants(node.left)
+        right = self._check_invariants(node.right)
+        self.assertLessEqual(abs(left - right), 1)
+        self.assertEqual(node.height, 1 + max(left, right))
+        self.assertEqual(node.size,
+                         node.count + (node.left.size if node.left else 0) + (node.right.size if node.right else 0))
+        return node.height
+
+    def test_bulk_insert(self):
+        sorted_list = list(range(1000))
+        tree = AVLTree(sorted_list)
+        self.assertEqual(list(tree), sorted_list)
+        self.assertEqual(len(tree), 1000)
+        self.assertEqual(self._check_invariants(tree.root), 10)
+
+        random_list = [random.randint(-100, 100) for _ in range(500)]
+        tree = AVLTree(random_list)
+        self.assertEqual(list(tree), sorted(random_list))
+        self.assertEqual(len(tree), 500)
+        self._check_invariants(tree.root)
+
+        # слияние крупного пакета с непустым деревом
+        batch = [random.randint(-100, 100) for _ in range(500)]
+        tree.insert(batch)
+        self.assertEqual(list(tree), sorted(random_list + batch))
+        self.assertEqual(len(tree), 1000)
+        self._check_invariants(tree.root)
+
+        # небольшой пакет добавляется поэлементно
+        tree.insert([7, 3])
+        self.assertEqual(list(tree), sorted(random_list + batch + [7, 3]))
+        self._check_invariants(tree.root)
+
+        tree = AVLTree(random_list, rewrite=True)
+        tree.insert(batch)
+        self.assertEqual(list(tree), sorted(set(random_list + batch)))
+        self.assertEqual(len(tree), len(set(random_list + batch)))
+        self._check_invariants(tree.root)
+
+    def test_delete(self):
+        values = [random.randint(-1000, 1000) for _ in range(2000)]
+        tree = AVLTree()
+        for value in values:
+            tree.append(value)
+        self._check_invariants(tree.root)
+
+        random.shuffle(values)
+        remaining = sorted(values)
+        for value in values[:1500]:
+            tree.delete(value)
+            remaining.remove(value)
+            self.assertEqual(len(tree), len(remaining))
+        self.assertEqual(list(tree), remaining)
+        self._check_invariants(tree.root)
+
+        with self.assertRaises(ValueError):
+            tree.delete(5000)
+
+    def test_array_storage(self):
+        values = [random.randint(-1000, 1000) for _ in range(1000)]
+        tree = ArrayAVLTree(values[:500])
+        for value in values[500:]:
+            tree.append(value)
+        self.assertEqual(list(tree), sorted(values))
+        self.assertEqual(list(reversed(tree)), sorted(values, reverse=True))
+        self.assertEqual(len(tree), 1000)
+
+        random.shuffle(values)
+        for value in values[:700]:
+            tree.delete(value)
+        remaining = sorted(values[700:])
+        self.assertEqual(list(tree), remaining)
+        self.assertEqual(tree.min_value(), remaining[0])
+        self.assertEqual(tree.max_value(), remaining[-1])
+        self.assertTrue(remaining[0] in tree)
+        self.assertFalse(5000 in tree)
+
+        # освобожденные ячейки используются повторно
+        size = len(tree._keys)
+        tree.insert([5000, 5001])
+        self.assertEqual(len(tree._keys), size)
+        self.assertTrue(5001 in tree)
+
+        tree = ArrayAVLTree([5])
+        tree.delete(5)
+        with self.assertRaises(IndexError):
+            tree.min_value()
+        with self.assertRaises(IndexError):
+            tree.max_value()
+        # неудачная запись в целочисленный массив не портит список свободных ячеек
+        with self.assertRaises(TypeError):
+            tree.append(1.5)
+        for value in (3, 1, 2):
+            tree.append(value)
+        self.assertEqual(list(tree), [1, 2, 3])
+        self.assertEqual(len(tree._keys), 3)  # освобожденная ячейка занята снова
+
+    def test_order_statistics(self):
+        values = [random.randint(-100, 100) for _ in range(300)]
+        tree = AVLTree(values[:100])
+        for value in values[100:]:
+            tree.append(value)
+        for value in values[:50]:
+            tree.delete(value)
+        expected = sorted(values[50:])
+        self._check_invariants(tree.root)
+
+        for i in range(-len(expected), len(expected)):
+            self.assertEqual(tree[i], expected[i])
+        self.assertEqual(tree.select(3), expected[3])
+        for index in (slice(None), slice(10, 20), slice(-30, -5, 3), slice(200, 5, -7), slice(None, None, -1),
+                      slice(5, 5), slice(1000, 2000)):
+            self.assertEqual(tree[index], expected[index])
+        for value in range(-105, 106):
+            self.assertEqual(tree.rank(value), bisect.bisect_left(expected, value))
+
+        with self.assertRaises(IndexError):
+            tree[len(expected)]
+        with self.assertRaises(IndexError):
+            AVLTree()[0]
+
+    def test_range_queries(self):
+        values = [random.randint(-50, 50) for _ in range(300)]
+        tree = AVLTree(values)
+        expected = sorted(values)
+
+        for value in range(-55, 56):
+            self.assertEqual(tree.bisect_left(value), bisect.bisect_left(expected, value))
+            self.assertEqual(tree.bisect_right(value), bisect.bisect_right(expected, value))
+            self.assertEqual(tree.floor(value), max((x for x in expected if x <= value), default=None))
+            self.assertEqual(tree.ceiling(value), min((x for x in expected if x >= value), default=None))
+            self.assertEqual(tree.lower(value), max((x for x in expected if x < value), default=None))
+            self.assertEqual(tree.higher(value), min((x for x in expected if x > value), default=None))
+
+        for _ in range(200):
+            lo, hi = random.choice([None, random.randint(-55, 55)]), random.choice([None, random.randint(-55, 55)])
+            inclusive = (random.random() < 0.5, random.random() < 0.5)
+            in_range = [x for x in expected
+                        if (lo is None or (lo <= x if inclusive[0] else lo < x))
+                        and (hi is None or (x <= hi if inclusive[1] else x < hi))]
+            self.assertEqual(list(tree.irange(lo, hi, inclusive)), in_range)
+            self.assertEqual(list(tree.irange(lo, hi, inclusive, reverse=True)), in_range[::-1])
+            self.assertEqual(tree.count_range(lo, hi, inclusive), len(in_range))
+
+    def test_key(self):
+        class Record:
+            def __init__(self, stamp):
+                self.stamp = stamp
+
+            def __lt__(self, other):
+                raise AssertionError('records must not be compared')
+
+            __gt__ = __le__ = __ge__ = __eq__ = __lt__
+            __hash__ = object.__hash__
+
+        stamps = [random.randint(0, 500) for _ in range(300)]
+        records = [Record(stamp) for stamp in stamps]
+        tree = AVLTree(records[:200], key=lambda record: record.stamp)
+        for record in records[200:]:
+            tree.append(record)
+        tree.insert(records[:5])
+
+        self.assertEqual([record.stamp for record in tree], sorted(stamps + stamps[:5]))
+        self.assertTrue(stamps[0] in tree)
+        self.assertFalse(501 in tree)
+        self.assertEqual(tree.get(stamps[0]).stamp, stamps[0])
+        self.assertIsNone(tree.get(501))
+        self.assertEqual(tree.rank(250), sum(stamp < 250 for stamp in stamps + stamps[:5]))
+
+        tree.delete(records[0])
+        self.assertEqual(len(tree), 304)
+        self._check_invariants(tree.root)
+
+        # при rewrite=True остается последний объект с равным ключом
+        tree = AVLTree(records, key=lambda record: record.stamp, rewrite=True)
+        self.assertEqual(len(tree), len(set(stamps)))
+        last = {stamp: record for stamp, record in zip(stamps, records)}
+        self.assertTrue(all(tree.get(stamp) is record for stamp, record in last.items()))
+
+    def test_stats(self):
+        events = []
+        tree = AVLTree(stats=True, trace=lambda event, node: events.append((event, node.data)))
+        for value in (1, 2, 3, 6, 5, 4):
+            tree.append(value)
+
+        self.assertEqual(tree.stats.rotations, 1)
+        self.assertEqual(tree.stats.double_rotations, 2)
+        self.assertEqual(tree.stats.max_height, tree.root.height)
+        self.assertIn(('rotate_left', 1), events)
+        self.assertIn(('rotate_right_left', 3), events)
+        self.assertEqual([value for event, value in events if event == 'insert'], [1, 2, 3, 6, 5, 4])
+
+        tree.stats.reset()
+        self.assertTrue(tree.root.data in tree)
+        self.assertEqual((tree.stats.visited, tree.stats.comparisons), (1, 2))
+        self.assertFalse(100 in tree)
+        self.assertEqual(tree.stats.visited, 1 + tree.root.height)
+
+        tree.delete(4)
+        self.assertEqual(events[-1], ('delete', 4))
+        self.assertIsNone(AVLTree().stats)
+
+    def test_set_algebra(self):
+        for size_a, size_b in ((300, 300), (1000, 20), (20, 1000), (0, 50)):
+            set_a = set(random.sample(range(3000), size_a))
+            set_b = set(random.sample(range(3000), size_b))
+            tree_a, tree_b = AVLTree(set_a, rewrite=True), AVLTree(set_b, rewrite=True)
+
+            for result, expected in ((tree_a | tree_b, set_a | set_b),
+                                     (tree_a & tree_b, set_a & set_b),
+                                     (tree_a - tree_b, set_a - set_b),
+                                     (tree_a ^ tree_b, set_a ^ set_b)):
+                self.assertEqual(list(result), sorted(expected))
+                self.assertEqual(len(result), len(expected))
+                self._check_invariants(result.root)
+            self.assertEqual(list(tree_a), sorted(set_a))
+            self.assertEqual(list(tree_b), sorted(set_b))
+
+            tree_a -= tree_b
+            self.assertEqual(list(tree_a), sorted(set_a - set_b))
+            tree_a |= tree_b
+            self.assertEqual(list(tree_a), sorted(set_a | set_b))
+            self._check_invariants(tree_a.root)
+            # узлы other копируются: изменение результата не затрагивает other
+            tree_a.clear()
+            self.assertEqual(list(tree_b), sorted(set_b))
+
+    def test_split_join(self):
+        values = [random.randint(0, 1000) for _ in range(500)]
+        tree = AVLTree(values)
+        left, right = tree.split(400)
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(list(left), sorted(x for x in values if x < 400))
+        self.assertEqual(list(right), sorted(x for x in values if x >= 400))
+        self._check_invariants(left.root)
+        self._check_invariants(right.root)
+
+        left.join(right)
+        self.assertEqual(list(left), sorted(values))
+        self.assertEqual(len(left), 500)
+        self.assertFalse(right)
+        self._check_invariants(left.root)
+
+        with self.assertRaises(ValueError):
+            AVLTree([5, 10]).join(AVLTree([7]))
+
+    def test_map(self):
+        reference = {random.randint(0, 1000): random.random() for _ in range(300)}
+        tree = AVLTreeMap(reference)
+        for _ in range(300):
+            key = random.randint(0, 1000)
+            tree[key] = reference[key] = random.random()
+        self.assertEqual(list(tree.items()), sorted(reference.items()))
+        self.assertEqual(list(tree.keys()), sorted(reference))
+        self.assertEqual(list(tree.values()), [reference[key] for key in sorted(reference)])
+        self.assertEqual(list(reversed(tree.items())), sorted(reference.items(), reverse=True))
+        self.assertEqual(len(tree), len(reference))
+        self._check_invariants(tree.root)
+
+        key = next(iter(reference))
+        self.assertEqual(tree[key], reference[key])
+        self.assertEqual(tree.get(-1, 'missing'), 'missing')
+        self.assertEqual(tree.setdefault(key, None), reference[key])
+        self.assertEqual(tree.setdefault(-1, 'new'), 'new')
+        self.assertEqual(tree.pop(-1), 'new')
+        self.assertEqual(tree.pop(-1, None), None)
+        with self.assertRaises(KeyError):
+            tree[-1]
+        with self.assertRaises(KeyError):
+            del tree[-1]
+
+        for key in list(reference)[:100]:
+            del tree[key]
+            del reference[key]
+        self.assertEqual(list(tree.items()), sorted(reference.items()))
+        self.assertEqual(tree.popitem(), max(reference.items()))
+        self.assertEqual(tree.popitem(last=False), min(reference.items()))
+        self.assertEqual(len(tree), len(reference) - 2)
+        self._check_invariants(tree.root)
+
+        merged = AVLTreeMap({1: 'a', 2: 'b'}) | AVLTreeMap({2: 'c', 3: 'd'})
+        self.assertEqual(list(merged.items()), [(1, 'a'), (2, 'c'), (3, 'd')])
+        self.assertEqual(dict(merged), {1: 'a', 2: 'c', 3: 'd'})
+
+        other = {random.randint(0, 1000): random.random() for _ in range(50)}
+        expected = {**dict(tree.items()), **other}
+        joined = AVLTreeMap(other)
+        tree |= joined  # объединение разрезанием и соединением, значения правой стороны побеждают
+        self.assertEqual(list(tree.items()), sorted(expected.items()))
+        self.assertEqual(list(joined.items()), sorted(other.items()))
+        self._check_invariants(tree.root)
+
+    def test_multiset(self):
+        values = [random.randint(0, 20) for _ in range(500)]
+        tree = AVLMultiset(values[:250])
+        for value in values[250:]:
+            tree.append(value)
+        tree.add(100, 5)
+        expected = sorted(values + [100] * 5)
+
+        self.assertEqual(len(tree), 505)
+        self.assertLessEqual(tree.root.size, 505)
+        self.assertEqual(self._size_nodes(tree.root), len(set(expected)))
+        self.assertEqual(list(tree), expected)
+        self.assertEqual(list(reversed(tree)), expected[::-1])
+        self.assertEqual(tree.count(100), 5)
+        self.assertEqual(tree.count(-1), 0)
+        self.assertEqual(tree[-1], 100)
+        self.assertEqual(tree[100:400:7], expected[100:400:7])
+        self.assertEqual(tree[400:100:-3], expected[400:100:-3])
+        self.assertEqual(tree.rank(10), bisect.bisect_left(expected, 10))
+        self.assertEqual(list(tree.irange(5, 7)), [x for x in expected if 5 <= x < 7])
+
+        counter = Counter(expected)
+        self.assertEqual(tree.discard(100, 2), 2)
+        self.assertEqual(tree.discard(100, 10), 3)
+        self.assertEqual(tree.discard(100), 0)
+        self.assertFalse(100 in tree)
+        counter[100] = 0
+        for value in values[:200]:
+            tree.delete(value)
+            counter[value] -= 1
+        self.assertEqual(list(tree), sorted(counter.elements()))
+        self.assertEqual(len(tree), sum(counter.values()))
+        with self.assertRaises(ValueError):
+            tree.delete(100)
+
+        tree.insert(values)
+        counter.update(values)
+        self.assertEqual(list(tree), sorted(counter.elements()))
+        self._check_invariants(tree.root)
+
+        # операции над множествами учитывают кратности, как у Counter
+        for _ in range(50):
+            first = [random.randint(0, 8) for _ in range(random.randint(0, 30))]
+            second = [random.randint(0, 8) for _ in range(random.randint(0, 30))]
+            a, b = AVLMultiset(first), AVLMultiset(second)
+            ca, cb = Counter(first), Counter(second)
+            for result, expected in ((a | b, ca | cb), (a & b, ca & cb), (a - b, ca - cb),
+                                     (a ^ b, (ca - cb) + (cb - ca))):
+                self.assertEqual(list(result), sorted(expected.elements()))
+                self.assertEqual(len(result), sum(expected.values()))
+                self._check_invariants(result.root)
+            self.assertEqual((list(a), list(b)), (sorted(first), sorted(second)))
+        self.assertEqual(list(AVLMultiset([1, 1, 2]) | AVLMultiset([1, 1, 1, 3])), [1, 1, 1, 2, 3])
+
+        # изменения кратности проходят через те же хуки, что и остальные записи
+        events = []
+        tree = AVLMultiset([1, 2, 2, 3], stats=True, trace=lambda event, node: events.append((event, node.key)))
+        events.clear()
+        visited = tree.stats.visited
+        tree.append(2)
+        self.assertEqual(tree.discard(2), 1)
+        self.assertEqual(tree.discard(2, 5), 2)
+        for n in (0, -1):
+            with self.assertRaises(ValueError):
+                tree.discard(1, n)
+        self.assertEqual(tree.count(1), 1)
+        self.assertEqual(events, [('insert', 2), ('delete', 2), ('delete', 2)])
+        self.assertGreater(tree.stats.visited, visited)
+        self.assertEqual(list(tree), [1, 3])
+        self._check_invariants(tree.root)
+
+    def _size_nodes(self, node):
+        return 0 if node is None else 1 + self._size_nodes(node.left) + self._size_nodes(node.right)
+
+    def test_snapshot(self):
+        values = [random.randint(-10 ** 12, 10 ** 12) for _ in range(1000)]
+        tree = AVLTree()
+        for value in values:
+            tree.append(value)
+        for value in values[:300]:
+            tree.delete(value)
+        expected = sorted(values[300:])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree.avl')
+            tree.dump(path)
+
+            loaded = AVLTree.load(path)
+            self.assertEqual(list(loaded), expected)
+            self.assertEqual(len(loaded), len(expected))
+            self._check_invariants(loaded.root)
+            self.assertEqual([node.key for node in loaded._iter_nodes(loaded.root)], expected)
+            self.assertEqual(loaded.root.data, tree.root.data)
+            self.assertEqual(loaded.root.left.data, tree.root.left.data)
+            self.assertEqual(loaded.root.right.right.data, tree.root.right.right.data)
+
+            with AVLTree.load(path, mapped=True) as mapped:
+                self.assertIsInstance(mapped, MappedAVLTree)
+                self.assertEqual(list(mapped), expected)
+                self.assertEqual(list(reversed(mapped)), expected[::-1])
+                self.assertEqual(len(mapped), len(expected))
+                self.assertEqual((mapped.min_value(), mapped.max_value()), (expected[0], expected[-1]))
+                self.assertTrue(expected[10] in mapped)
+                self.assertFalse(values[0] in mapped)
+                self.assertEqual(list(mapped.irange(0, 10 ** 12)), [x for x in expected if 0 <= x < 10 ** 12])
+                self.assertEqual(list(mapped.irange(0, None, reverse=True)), [x for x in expected if x >= 0][::-1])
+                self.assertEqual(mapped.count_range(None, 0), sum(x < 0 for x in expected))
+                self.assertEqual(mapped[5:9], expected[5:9])
+                pending = mapped.irange(0, None)
+                pending_slice = mapped[:]
+            with self.assertRaises(ValueError):
+                next(pending)
+            self.assertEqual(pending_slice, expected)
+
+            multiset = AVLMultiset([1.5, 1.5, 2.5, -3.0])
+            multiset.dump(path)
+            self.assertEqual(list(AVLMultiset.load(path)), [-3.0, 1.5, 1.5, 2.5])
+            with self.assertRaises(ValueError):
+                AVLTree.load(path)
+            with self.assertRaises(TypeError):
+                AVLTree(['a']).dump(path)
+            with self.assertRaises(TypeError):
+                AVLTree([True, 0.5]).dump(path)
+            AVLTree([1, 2]).dump(path)
+            with self.assertRaises(TypeError):
+                AVLTreeMap.load(path)
+            with self.assertRaises(TypeError):
+                AVLTree.load(path, mapped=True, rewrite=True)
+
+    def test_persistent(self):
+        def node_ids(node):
+            return set() if node is None else {id(node)} | node_ids(node.left) | node_ids(node.right)
+
+        tree = PersistentAVLTree(range(0, 2000, 2))
+        versions = [(tree.snapshot(), list(tree))]
+        for _ in range(300):
+            value = random.randint(0, 2000)
+            if value in tree and random.random() < 0.5:
+                tree.delete(value)
+            else:
+                tree.append(value)
+            versions.append((tree.snapshot(), list(tree)))
+        tree.update(PersistentAVLTree(range(5000, 5100)))
+        tree.difference_update(AVLTree(range(0, 500)))
+        left, right = tree.split(1000)
+        left.join(right)
+        tree = left
+
+        for version, expected in versions:
+            self.assertEqual(list(version), expected)
+            self._check_invariants(version.root)
+        self._check_invariants(tree.root)
+
+        # изменение копирует только путь от корня и узлы поворотов
+        before = tree.snapshot()
+        tree.append(777)
+        shared = node_ids(before.root) & node_ids(tree.root)
+        self.assertGreaterEqual(len(shared), len(before) - 3 * before.root.height)
+
+    def test_concurrent(self):
+        tree = ConcurrentAVLTree(range(0, 1000, 2))
+        frozen = iter(tree)  # итератор видит версию на момент создания
+
+        def writer(start):
+            for value in range(start, 1000, 8):
+                tree.append(value)
+            for value in range(start - 1, 1000, 8):
+                tree.delete(value)
+
+        failures = []
+
+        def reader():
+            for _ in range(200):
+                version = tree.snapshot()
+                items = list(version)
+                if items != sorted(set(items)) or len(items) != len(version):
+                    failures.append(items)
+
+        threads = [threading.Thread(target=writer, args=(start,)) for start in (1, 3, 5, 7)]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(list(tree), list(range(1, 1000, 2)))
+        self.assertEqual(list(frozen), list(range(0, 1000, 2)))
+        self._check_invariants(tree.snapshot().root)
+        self.assertFalse(tree.discard(-1))
+        with self.assertRaises(ValueError):
+            tree.delete(-1)
+
+        async def main():
+            await asyncio.gather(*(tree.aadd(value) for value in range(-10, 0)))
+            await tree.adelete(-10)
+            return await tree.adiscard(-9)
+
+        self.assertTrue(asyncio.run(main()))
+        self.assertEqual(tree[:8], list(range(-8, 0)))
+
+        # ошибка одной записи в объединенной вставке не задевает записи других потоков
+        tree = ConcurrentAVLTree([1, 2, 3])
+        futures = [Future() for _ in range(4)]
+        for future, (operation, value) in zip(futures, [('append', 10), ('append', 'bad'),
+                                                         ('insert', [4, 5]), ('append', 0)]):
+            tree._pending.append((operation, value, future))
+        tree._apply_pending()
+        self.assertIsInstance(futures[1].exception(), TypeError)
+        self.assertEqual([future.result() for future in futures if future is not futures[1]], [None] * 3)
+        self.assertEqual(list(tree), [0, 1, 2, 3, 4, 5, 10])
+
+        # прерывание применения завершает ожидание всех записей пакета
+        class Interrupt(BaseException):
+            pass
+
+        def key(value):
+            if value == 'stop':
+                raise Interrupt
+            return value
+
+        tree = ConcurrentAVLTree([1, 2, 3], key=key)
+        self.assertIs(tree._tree._first, tree._tree.root.left)  # кэш заполнен до первого чтения
+        futures = [Future() for _ in range(2)]
+        tree._pending.append(('append', 'stop', futures[0]))
+        tree._pending.append(('delete', 2, futures[1]))
+        with self.assertRaises(Interrupt):
+            tree.append(4)
+        self.assertTrue(all(isinstance(future.exception(), RuntimeError) for future in futures))
+        self.assertEqual(list(tree), [1, 2, 3])
+        tree.append(0)
+        self.assertEqual((list(tree), tree._tree._first.data, tree._tree._last.data), ([0, 1, 2, 3], 0, 3))
+
+    def test_priority_queue(self):
+        for tree in (AVLTree(), PersistentAVLTree(), AVLMultiset()):
+            expected = []
+            for _ in range(2000):
+                roll = random.random()
+                if roll < 0.5 or not expected:
+                    value = random.randint(0, 300)
+                    tree.append(value)
+                    expected.append(value)
+                    expected.sort()
+                elif roll < 0.7:
+                    self.assertEqual(tree.pop_min(), expected.pop(0))
+                elif roll < 0.9:
+                    self.assertEqual(tree.pop_max(), expected.pop())
+                else:
+                    value = random.choice(expected)
+                    tree.delete(value)
+                    expected.remove(value)
+                self.assertEqual(len(tree), len(expected))
+                if expected:
+                    self.assertEqual((tree.peek_min(), tree.peek_max()), (expected[0], expected[-1]))
+                    self.assertEqual((tree[0], tree[-1]), (expected[0], expected[-1]))
+            self.assertEqual(list(tree), expected)
+            self._check_invariants(tree.root)
+
+        tree = AVLTree()
+        for method in (tree.pop_min, tree.pop_max, tree.peek_min, tree.peek_max):
+            with self.assertRaises(IndexError):
+                method()
+
+        mapping = AVLTreeMap({3: 'c', 1: 'a', 2: 'b'})
+        self.assertEqual((mapping.popitem(last=False), mapping.popitem()), ((1, 'a'), (3, 'c')))
+
+        data = [random.randint(0, 50) for _ in range(300)]
+        heap, reference = avl_heapq.heapify(data[:100]), sorted(data[:100])
+        heapq.heapify(reference)
+        for value in data[100:]:
+            self.assertEqual(avl_heapq.heappushpop(heap, value), heapq.heappushpop(reference, value))
+            self.assertEqual(avl_heapq.heapreplace(heap, value // 2), heapq.heapreplace(reference, value // 2))
+            avl_heapq.heappush(heap, value)
+            heapq.heappush(reference, value)
+            self.assertEqual(heap[0], reference[0])
+        self.assertEqual(avl_heapq.nsmallest(5, heap), heapq.nsmallest(5, reference))
+        self.assertEqual(avl_heapq.nlargest(5, heap), heapq.nlargest(5, reference))
+        for function in (avl_heapq.heappush, avl_heapq.heappushpop, avl_heapq.heapreplace):
+            with self.assertRaises(TypeError):
+                function([], 1)  # список от heapq нужно сначала превратить в кучу heapify
+        with self.assertRaises(TypeError):
+            avl_heapq.heappop([1])
+        self.assertEqual([avl_heapq.heappop(heap) for _ in range(len(heap))],
+                         [heapq.heappop(reference) for _ in range(len(reference))])
+
+    def test_cursor(self):
+        for tree_type in (AVLTree, PersistentAVLTree):
+            values = sorted(random.randint(0, 500) for _ in range(300))
+            tree = tree_type(values)
+            cursor = tree.seek()
+            self.assertEqual(cursor.value, values[0])
+            for _ in range(500):
+                probe = random.randint(-10, 510)
+                index = bisect.bisect_left(values, probe)
+                cursor.seek(probe)  # поиск от текущей позиции
+                self.assertEqual(bool(cursor), index < len(values))
+                if index == len(values):
+                    with self.assertRaises(IndexError):
+                        cursor.value
+                    cursor.seek()
+                    continue
+                self.assertEqual(cursor.value, values[index])
+                self.assertEqual(tree.seek(probe).value, values[index])
+
+                steps = random.randint(-5, 5)
+                for _ in range(abs(steps)):
+                    if steps > 0 and index + 1 < len(values):
+                        index += 1
+                        self.assertEqual(cursor.next(), values[index])
+                    elif steps < 0 and index > 0:
+                        index -= 1
+                        self.assertEqual(cursor.prev(), values[index])
+                if random.random() < 0.2:
+                    self.assertEqual(cursor.delete_here(), values.pop(index))
+                    self.assertEqual(list(tree), values)
+                    if index < len(values):
+                        self.assertEqual(cursor.value, values[index])
+                    else:
+                        self.assertFalse(cursor)
+                        cursor.seek()
+
+            cursor = tree.seek(values[-1])
+            for _ in range(values.count(values[-1]) - 1):
+                cursor.next()
+            with self.assertRaises(IndexError):
+                cursor.next()
+            self.assertEqual(cursor.value, values[-1])
+            tree.append(1000)
+            with self.assertRaises(RuntimeError):
+                cursor.next()
+            self.assertEqual(cursor.seek(999).value, 1000)
+            self._check_invariants(tree.root)
+
+        multiset = AVLMultiset([1, 2, 2, 3])
+        cursor = multiset.seek(2)
+        self.assertEqual((cursor.delete_here(), cursor.value), (2, 2))
+        self.assertEqual((cursor.delete_here(), cursor.value), (2, 3))
+        self.assertEqual(cursor.prev(), 1)
+        self.assertEqual(list(multiset), [1, 3])
+        self.assertFalse(AVLTree().seek(1))
+
+        mapping = AVLTreeMap({1: 'a', 3: 'c', 5: 'e'})
+        cursor = mapping.seek(2)
+        self.assertEqual((cursor.key, cursor.value), (3, 'c'))
+        self.assertEqual(cursor.next(), 5)  # шаги возвращают ключи, как обход отображения
+        self.assertEqual(cursor.value, 'e')
+        self.assertEqual(AVLTree(['bb', 'a'], key=len).seek(2).key, 2)
+
+    def test_equality(self):
+        values = random.sample(range(10000), 2000)
+        tree = AVLTree(values)
+        other = AVLTree()
+        for value in values:
+            other.append(value)
+        self.assertEqual(tree, other)  # одинаковое содержимое при разной форме
+        self.assertEqual(hash(tree), hash(other))
+        self.assertEqual(tree.diff(other), ([], []))
+
+        digest = hash(tree)
+        tree.append(-1)
+        other.append(-2)  # hash(-1) == hash(-2), но дайджесты чисел выводятся из значений
+        self.assertNotEqual(hash(tree), digest)
+        self.assertNotEqual(tree, other)
+        self.assertEqual(tree.diff(other), ([-1], [-2]))
+        tree.delete(-1)
+        other.delete(-2)
+        self.assertEqual(hash(tree), digest)
+        self.assertEqual(tree, other)
+        self.assertNotEqual(tree, AVLTree(values[1:]))
+        self.assertNotEqual(AVLTree([-1]), AVLTree([-2]))  # равные хеши, разные объекты
+        self.assertEqual(AVLTree([-1, 5, 9]).diff(AVLTree([-2, 5, 9])), ([-1], [-2]))
+        self.assertEqual(AVLTree([0, 5, 9]).diff(AVLTree([2 ** 61 - 1, 5, 9])), ([0], [2 ** 61 - 1]))
+        self.assertEqual(AVLTree([1.0, 2, 3]), AVLTree([1, 2, 3]))
+        self.assertEqual(AVLTree(), AVLTree())
+
+        replica = PersistentAVLTree(values)
+        base = replica.snapshot()
+        removed, added = values[:20], [random.randint(10000, 20000) for _ in range(20)]
+        for value in removed:
+            replica.delete(value)
+        for value in added:
+            replica.append(value)
+        self.assertEqual(base.diff(replica), (sorted(removed), sorted(added)))
+        self.assertEqual(replica.diff(base), (sorted(added), sorted(removed)))
+        self.assertNotEqual(replica, base)
+        self.assertEqual(replica, AVLTree(values[20:] + added))
+
+        for first, second in ((AVLMultiset('abracadabra'), AVLMultiset('cadabra')),
+                              (AVLMultiset([3, 3, 1]), AVLMultiset([1, 3, 3]))):
+            expected = Counter(first), Counter(second)
+            only_first, only_second = first.diff(second)
+            self.assertEqual((Counter(only_first), Counter(only_second)),
+                             (expected[0] - expected[1], expected[1] - expected[0]))
+            self.assertEqual(first == second, expected[0] == expected[1])
+
+        mapping = AVLTreeMap({1: 'a', 2: 'b'})
+        self.assertEqual(mapping, {1: 'a', 2: 'b'})
+        changed = AVLTreeMap({1: 'a', 2: 'c'})
+        self.assertNotEqual(hash(mapping), hash(changed))
+        self.assertEqual(mapping.diff(changed), ([(2, 'b')], [(2, 'c')]))
+        changed[2] = 'b'
+        self.assertEqual(hash(mapping), hash(changed))
+        self.assertEqual(mapping, changed)
+        lists = AVLTreeMap({1: [1], 2: [2], 3: [3]})
+        self.assertEqual(lists.diff(AVLTreeMap({1: [1], 2: [5], 3: [3]})), ([(2, [2])], [(2, [5])]))
+
+    def test_batch_lookups(self):
+        values = [random.randint(0, 3000) for _ in range(2000)]
+        probes = [random.randint(-10, 3010) for _ in range(3000)]
+        for tree in (AVLTree(values), AVLMultiset(values), AVLTreeMap((value, -value) for value in values)):
+            expected = sorted(set(values)) if isinstance(tree, AVLTreeMap) else sorted(values)
+            for batch in (probes[:5], probes):  # короткий пакет обходится спусками, длинный - плоским видом
+                self.assertEqual(tree.contains_many(batch), [probe in tree for probe in batch])
+                self.assertEqual(tree.rank_many(batch), [bisect.bisect_left(expected, probe) for probe in batch])
+                self.assertEqual(tree.get_many(batch, 'missing'), [tree.get(probe, 'missing') for probe in batch])
+
+            # плоский вид перестраивается после изменения дерева
+            smallest = expected[0]
+            while smallest in tree:
+                tree.delete(smallest)
+            self.assertEqual(tree.contains_many([smallest] * len(probes)), [False] * len(probes))
+        self.assertEqual(AVLTree().contains_many([1, 2]), [False, False])
+
+        key_tree = AVLTree(['bb', 'a', 'ccc'], key=len)
+        self.assertEqual(key_tree.get_many(iter([3, 4, 1])), ['ccc', None, 'a'])
+
+    @unittest.skipIf(trees.numpy is None, 'NumPy is not installed')
+    def test_batch_lookups_numpy(self):
+        numpy = trees.numpy
+        values = [random.randint(0, 3000) for _ in range(2000)]
+        probes = numpy.array([random.randint(-10, 3010) for _ in range(3000)])
+        for tree in (AVLTree(values), AVLMultiset(values)):
+            found = tree.contains_many(probes)
+            self.assertEqual(found.dtype, bool)
+            self.assertEqual(found.tolist(), tree.contains_many(probes.tolist()))
+            self.assertEqual(tree.rank_many(probes).tolist(), tree.rank_many(probes.tolist()))
+            self.assertEqual(tree.get_many(probes), tree.get_many(probes.tolist()))
+
+        # целые ключи больше 2**53 не совпадают с ближайшим float
+        big = 2 ** 53 + 1
+        floats = numpy.array([float(2 ** 53), 4.0, 5.0])
+        for tree in (AVLTree([big, 5, 7]), AVLTree(list(range(0, 2000, 2)) + [big])):
+            self.assertEqual(tree.contains_many(floats).tolist(), [key in tree for key in floats.tolist()])
+            self.assertEqual(tree.rank_many(floats).tolist(), [tree.rank(key) for key in floats.tolist()])
+            self.assertEqual(tree.get_many(floats), [tree.get(key) for key in floats.tolist()])
+            self.assertFalse(tree.contains_many(floats)[0])
+        self.assertEqual(AVLTree(list(range(1000)) + [2 ** 64 - 1]).contains_many(
+            numpy.array([2 ** 64 - 1, 2 ** 64 - 2], dtype=numpy.uint64)).tolist(), [True, False])
+
+    def test_external_sort(self):
+        values = [random.randint(0, 100) for _ in range(1000)]
+        for kwargs in ({'chunk_size': 7, 'fan_in': 2}, {'chunk_size': 50, 'memory_limit': 400, 'fan_in': 3}, {}):
+            self.assertEqual(list(external_sort.external_sort(iter(values), **kwargs)), sorted(values))
+        pairs = [(random.randint(0, 5), i) for i in range(300)]
+        for reverse in (False, True):
+            self.assertEqual(list(external_sort.external_sort(pairs, key=lambda pair: pair[0], reverse=reverse,
+                                                              chunk_size=13, fan_in=3)),
+                             sorted(pairs, key=lambda pair: pair[0], reverse=reverse))
+
+        with tempfile.TemporaryDirectory() as directory:
+            stream = external_sort.external_sort(reversed(values), chunk_size=10, temp_dir=directory)
+            next(stream)
+            self.assertTrue(os.listdir(directory))
+            stream.close()
+            self.assertEqual(os.listdir(directory), [])
+
+            path = os.path.join(directory, 'index.avlt')
+            self.assertEqual(external_sort.sort_to_index(iter(values), path, chunk_size=64), len(values))
+            self.assertEqual(list(AVLTree.load(path)), sorted(values))
+            mapped = MappedAVLTree(path)
+            self.assertEqual(list(mapped), sorted(values))
+            del mapped
+
+            for n in range(20):
+                AVLTree.dump_sorted(range(n), path, block_size=3)
+                with open(path, 'rb') as file:
+                    written = file.read()
+                AVLTree(range(n)).dump(path)
+                with open(path, 'rb') as file:
+                    self.assertEqual(written, file.read())
+            with self.assertRaises(ValueError):
+                AVLTree.dump_sorted([2, 1], path)
+            with self.assertRaises(TypeError):
+                AVLTree.dump_sorted([1, 2.5], path)
+
+            # поток, оборвавшийся посередине, не портит прежний снимок
+            def broken():
+                yield from range(100)
+                raise OSError('stream closed')
+            AVLTree.dump_sorted(range(5), path)
+            with self.assertRaises(OSError):
+                AVLTree.dump_sorted(broken(), path, block_size=7)
+            self.assertEqual(list(AVLTree.load(path)), list(range(5)))
+            self.assertEqual(os.listdir(directory), ['index.avlt'])
+
+    def test_benchmarks(self):
+        results = [benchmarks.Result('AVLTree', 'append', 'sorted', 10, ops_per_sec=ops)
+                   for ops in (80.0, 79.0, 150.0, None)]
+        results.append(benchmarks.Result('AVLTree', 'delete', 'sorted', 10, ops_per_sec=1.0))  # нет в базе
+        baseline = [{'structure': 'AVLTree', 'operation': 'append', 'workload': 'sorted', 'n': 10,
+                     'ops_per_sec': 100.0}]
+        self.assertEqual(benchmarks.compare(results, baseline, 0.2), [(results[1], 100.0)])
+        self.assertEqual(benchmarks.compare(results, baseline, 0.25), [])
+        baseline[0]['ops_per_sec'] = None  # прошлый замер упал
+        self.assertEqual(benchmarks.compare(results, baseline, 0.2), [])
+
+        # структуры, созданные в setup, не входят в пик памяти
+        def setup(keys: list):
+            data = list(range(10 ** 5))
+            return lambda: len(data) and None
+        result = benchmarks.measure(benchmarks.Case('list', 'len', setup), [1, 2, 3], 'sorted', 1, True)
+        self.assertLess(result.peak_memory, 10 ** 5)
+
+        for storage in ('nodes', 'array'):
+            self.assertGreater(benchmarks.memory_per_key(1000, storage), 0)
+        output = io.StringIO()
+        with mock.patch('sys.argv', ['benchmarks.py', '-n', '100', '1000', '--memory-per-key']), \
+                redirect_stdout(output):
+            benchmarks.main()
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ['100', '1000'])
+        self.assertTrue(all(float(value) > 0 for line in lines[1:] for value in line.split()[1:]))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'before.json')
+            argv = ['benchmarks.py', '-n', '20', '--workloads', 'sorted', '--no-memory']
+            with mock.patch('sys.argv', argv + ['--output', path]), redirect_stdout(io.StringIO()):
+                benchmarks.main()
+            with mock.patch('sys.argv', argv + ['--compare', path, '--threshold', '1']), \
+                    redirect_stdout(io.StringIO()):
+                benchmarks.main()  # падение ops/sec меньше 100% - не регрессия
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            report['results'] = report['results'][:1]
+            report['results'][0]['ops_per_sec'] = float('inf')
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file)
+            errors = io.StringIO()
+            with mock.patch('sys.argv', argv + ['--compare', path]), redirect_stdout(io.StringIO()), \
+                    redirect_stderr(errors), self.assertRaises(SystemExit) as exit_info:
+                benchmarks.main()
+            self.assertEqual(exit_info.exception.code, 1)
+            self.assertEqual(errors.getvalue().count('regression:'), 1)
+
     def test_list(self):
         tested_list = [-321, 23, 44, 0, 100, -8]
         sorted_list = sorted(tested_list)
@@ -1,18 +1,130 @@
+import asyncio
+import copy
+import heapq
 import logging
-from typing import Optional, Any, Iterable, Callable, Generator
+import mmap
+import numbers
+import os
+import struct
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from operator import itemgetter
+from array import array
+from collections import deque
+from collections.abc import ItemsView, KeysView, Mapping, MutableMapping, ValuesView
+from itertools import accumulate, chain, groupby, islice, repeat
+from typing import Optional, Any, Iterable, Iterator, Callable, Generator, Union
+
+try:
+    import numpy
+except ImportError:  # NumPy необязателен: без него пакетные запросы принимают последовательности
+    numpy = None
+
+_DIGEST_MASK = (1 << 64) - 1
+
+
+def _mix(value: int) -> int:
+    """Перемешивание битов хеша (финализатор splitmix64), чтобы суммы хешей близких чисел не совпадали"""
+    value &= _DIGEST_MASK
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & _DIGEST_MASK
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & _DIGEST_MASK
+    return value ^ (value >> 31)
+
+
+def _digest(element: Any) -> int:
+    """Перемешанный 64-битный дайджест объекта для сверки содержимого деревьев.
+
+    Целые числа (и равные им ``float`` и другие числа) дают дайджест по самому значению,
+    а не по ``hash()``: в CPython ``hash(-1) == hash(-2)``, а хеши целых повторяются с периодом
+    2**61 - 1. Значения из диапазона [-2**64, 2**64) получают разные дайджесты. Кортежи
+    сворачиваются поэлементно, остальные объекты перемешивают свой ``hash()``.
+
+    :raise TypeError: Объект не хешируется.
+    """
+    if isinstance(element, numbers.Number) and not isinstance(element, int):
+        try:
+            integral = int(element)
+        except (TypeError, ValueError, OverflowError):
+            integral = None
+        if integral is not None and integral == element:
+            element = integral
+    if isinstance(element, int):
+        digest = element & _DIGEST_MASK
+        element >>= 64
+        while element not in (0, -1):
+            digest = _mix(digest) ^ (element & _DIGEST_MASK)
+            element >>= 64
+        return _mix(digest) ^ (element & 1)
+    if isinstance(element, tuple):
+        digest = len(element)
+        for item in element:
+            digest = _mix(digest + _digest(item))
+        return digest
+    return _mix(hash(element))
 
 
 class Node:
     """Узел для АВЛ-дерева"""
 
-    def __init__(self, value: Any):
+    __slots__ = ('data', 'key', 'left', 'right', 'height', 'size', 'digest')
+
+    count = 1  # кратность объекта; узлы мультимножества хранят ее в собственном слоте
+
+    def __init__(self, value: Any, key: Any = None):
         self.data: Any = value
+        self.key: Any = value if key is None else key  # ключ сравнения, вычисленный при вставке
         self.left: Optional["Node"] = None
         self.right: Optional["Node"] = None
         self.height: int = 1  # высота узла
+        self.size: int = 1  # количество узлов в поддереве
+        self.digest: Optional[int] = None  # дайджест содержимого поддерева; None - нужно пересчитать
+
+    def copy(self) -> "Node":
+        """Копия узла с теми же потомками"""
+        node = object.__new__(type(self))
+        node.data = self.data
+        node.key = self.key
+        node.left = self.left
+        node.right = self.right
+        node.height = self.height
+        node.size = self.size
+        node.digest = self.digest
+        return node
+
+    def _element(self) -> Any:
+        """Объект узла, по которому сравнивается содержимое деревьев"""
+        return self.data
 
     def __hash__(self) -> int:
-        return hash((self.data, self.left, self.right))
+        """Дайджест содержимого поддерева: сумма дайджестов объектов (см. :func:`_digest`) по модулю 2**64.
+
+        Сумма не зависит от формы поддерева, поэтому поддеревья с одинаковым содержимым имеют
+        равные дайджесты. Дайджест хранится в узле, изменения дерева сбрасывают его только
+        у узлов измененного пути, а пересчет без рекурсии обходит лишь узлы со сброшенным дайджестом.
+        """
+        if self.digest is not None:
+            return self.digest
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            left, right = node.left, node.right
+            if left is not None and left.digest is None:
+                stack.append(left)
+            elif right is not None and right.digest is None:
+                stack.append(right)
+            else:
+                stack.pop()
+                digest = _digest(node._element()) * node.count
+                if left is not None:
+                    digest += left.digest
+                if right is not None:
+                    digest += right.digest
+                node.digest = digest & _DIGEST_MASK
+        return self.digest
 
     def __bool__(self) -> bool:
         return True if self.data is not None else False
@@ -24,17 +136,82 @@ class Node:
         return f"<{self}>"
 
 
+class MapNode(Node):
+    """Узел для АВЛ-дерева отображения: ключ хранится в ``data`` и ``key``, значение - в ``value``"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, key: Any, value: Any):
+        super().__init__(key)
+        self.value: Any = value
+
+    def copy(self) -> "MapNode":
+        """Копия узла с теми же потомками"""
+        node = super().copy()
+        node.value = self.value
+        return node
+
+    def _element(self) -> tuple[Any, Any]:
+        return self.data, self.value
+
+
+@dataclass
+class TreeStats:
+    """Счетчики операций АВЛ-дерева"""
+
+    rotations: int = 0  # малые (одинарные) повороты
+    double_rotations: int = 0  # большие (двойные) повороты
+    comparisons: int = 0  # сравнения ключей при спуске
+    visited: int = 0  # узлы, пройденные при спуске
+    max_height: int = 0  # наибольшая достигнутая высота дерева
+
+    def reset(self) -> None:
+        """Обнуление счетчиков"""
+        self.rotations = self.double_rotations = self.comparisons = self.visited = self.max_height = 0
+
+
+# заголовок файла снимка: сигнатура, версия, тип ключей, флаги, число узлов, индекс корня,
+# число элементов с учетом кратностей
+_SNAPSHOT_HEADER = struct.Struct('<4sBcBxQqQ')
+_SNAPSHOT_MAGIC = b'AVLT'
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_COUNTS = 1  # флаг: в снимке есть столбец кратностей
+_SNAPSHOT_BIG_ENDIAN = 2  # флаг: столбцы записаны в порядке байтов big-endian
+
+
 class AVLTree:
-    """Сбалансированное по высоте двоичное дерево поиска"""
+    """Сбалансированное по высоте двоичное дерево поиска.
+
+    Функция ``key`` (как в ``sorted()``) вычисляется один раз для каждого добавляемого объекта,
+    ключ сохраняется в узле, и все сравнения выполняются только между ключами.
+
+    Диагностика по умолчанию отключена и не стоит ничего. При ``stats=True`` дерево ведет
+    счетчики :class:`TreeStats` в атрибуте ``stats``, а функция ``trace(event, node)`` вызывается
+    при вставке (``'insert'``), перезаписи (``'rewrite'``), удалении (``'delete'``), построении
+    (``'build'``) и поворотах (``'rotate_left'``, ``'rotate_right'``, ``'rotate_left_right'``,
+    ``'rotate_right_left'``).
+
+    Для числовых ключей есть отдельный компактный класс :class:`ArrayAVLTree` с узлами в массивах.
+    """
 
     def __init__(self,
                  data: Optional[Iterable] = None,
                  *,
                  key: Optional[Callable] = None,
-                 rewrite: bool = False) -> None:
+                 rewrite: bool = False,
+                 stats: bool = False,
+                 trace: Optional[Callable[[str, Node], None]] = None) -> None:
         self.root: Optional[Node] = None  # корень дерева
+        self.key = key
         self.rewrite = rewrite
+        self.stats: Optional[TreeStats] = TreeStats() if stats else None
+        self.trace = trace
         self._len: int = 0
+        # кэш крайних узлов; None при непустом дереве означает, что узел нужно найти заново
+        self._first: Optional[Node] = None
+        self._last: Optional[Node] = None
+        self._version: int = 0  # номер изменения; по нему курсоры узнают, что дерево изменилось
+        self._flat: Optional[tuple] = None  # плоское представление для пакетных запросов
 
         if data:
             self.insert(data)
@@ -42,41 +219,231 @@ class AVLTree:
     def insert(self, iterable: Iterable) -> None:
         """Добавление последовательности в дерево.
 
+        Последовательность сортируется один раз (уже отсортированный вход Timsort распознает
+        за O(n)), после чего пустое дерево строится целиком за O(n). Крупный пакет сливается
+        с содержимым непустого дерева, и дерево перестраивается; небольшой пакет добавляется
+        поэлементно.
+
         :param iterable: Последовательность
         """
-        for value in iterable:
-            self.append(value)
+        values = list(iterable)
+        if not values:
+            return
+        if self.key is None:
+            values.sort()
+            keys = values
+        else:
+            keys = list(map(self.key, values))
+            order = sorted(range(len(values)), key=keys.__getitem__)
+            keys = [keys[i] for i in order]
+            values = [values[i] for i in order]
+        self._insert_sorted(keys, values)
+
+    def _insert_sorted(self, keys: list, values: list) -> None:
+        """Добавление отсортированной по ключам последовательности.
+
+        :param keys: Отсортированный список ключей.
+        :param values: Соответствующий ключам список значений.
+        """
+        if self.root is not None:
+            # поэлементная вставка дешевле перестроения: k * log(n) < n
+            if len(values) * self._len.bit_length() < self._len:
+                for key, value in zip(keys, values):
+                    self._append(key, value)
+                return
+            # при равенстве ключей значения дерева идут раньше новых, как при поэлементной вставке
+            merged = list(heapq.merge(self._in_order_items(self.root), zip(keys, values), key=itemgetter(0)))
+            keys = [key for key, _ in merged]
+            values = [value for _, value in merged]
+
+        if self.rewrite:
+            keys, values = self._unique(keys, values)
+
+        self.root = self._build(keys, values, 0, len(values))
+        self._len = len(values)
+        self._first = self._last = None
+        self._version += 1
+        if self.stats is not None:
+            self._count(0, 0)
+        if self.trace is not None:
+            self.trace('build', self.root)
+
+    @staticmethod
+    def _unique(keys: list, values: list) -> tuple[list, list]:
+        """Удаление повторов из отсортированной последовательности.
+
+        :param keys: Отсортированный список ключей.
+        :param values: Соответствующий ключам список значений.
+        :return: Ключи и значения без повторов ключей; из равных остается последнее значение.
+        """
+        unique_keys = []
+        unique_values = []
+        for key, value in zip(keys, values):
+            if unique_keys and key == unique_keys[-1]:
+                unique_values[-1] = value
+            else:
+                unique_keys.append(key)
+                unique_values.append(value)
+        return unique_keys, unique_values
+
+    def _build(self, keys: list, values: list, lo: int, hi: int) -> Optional[Node]:
+        """Построение идеально сбалансированного поддерева из отсортированного среза.
+
+        :param keys: Отсортированный список ключей.
+        :param values: Соответствующий ключам список значений.
+        :param lo: Начало среза (включительно).
+        :param hi: Конец среза (не включительно).
+        :return: Возвращает корень построенного поддерева.
+        """
+        if lo >= hi:
+            return None
+
+        mid = (lo + hi) // 2
+        node = self._new_node(keys[mid], values[mid])
+        node.left = self._build(keys, values, lo, mid)
+        node.right = self._build(keys, values, mid + 1, hi)
+        self._update(node)
+        return node
 
-    def append(self, value: int) -> None:
+    def append(self, value: Any) -> None:
         """Добавление объекта в дерево.
 
-        :param value: Любой объект, имеющий сравнивающие методы.
+        :param value: Любой объект, имеющий сравнивающие методы (или объект, ключ которого их имеет).
         """
-        self.root = self._append(self.root, value)
+        self._append(value if self.key is None else self.key(value), value)
+
+    def _append(self, key: Any, value: Any) -> None:
+        """Итеративное добавление объекта в дерево.
 
-    def _append(self, node: Optional[Node], value: int) -> Node:
-        """Рекурсивная функция добавления объекта в дерево.
+        Спуск от корня запоминает пройденный путь, по которому затем выполняется балансировка.
 
-        :param node: Проверяемый узел.
+        :param key: Ключ добавляемого объекта.
         :param value: Добавляемый объект.
-        :return: Возвращает корневой узел дерева.
         """
-        if not node:
-            new_node = Node(value)
-            logging.info("Создание узла {}".format(new_node))
-            self._len += 1
-            return new_node
-
-        if self.rewrite and value == node.data:
-            node.data = value
-            logging.info("Перезаписывание значения в узел {}".format(node))
-            return node
-        elif value < node.data:
-            node.left = self._append(node.left, value)
+        node = self.root
+        path = []
+        go_left = False
+        while node is not None:
+            if self.rewrite and key == node.key:
+                path.append(node)
+                path = self._own_path(path)
+                node = path[-1]
+                self._rewrite(node, key, value)
+                self._version += 1
+                for parent in path:
+                    parent.digest = None
+                if self.stats is not None:
+                    self._count(len(path), 2 * len(path) - 1)
+                if self.trace is not None:
+                    self.trace('rewrite', node)
+                return
+            path.append(node)
+            go_left = key < node.key
+            node = node.left if go_left else node.right
+
+        self._attach(path, go_left, self._new_node(key, value))
+
+    def _attach(self, path: list[Node], go_left: bool, new_node: Node) -> None:
+        """Присоединение нового листа к концу пути спуска и балансировка пути.
+
+        :param path: Путь от корня до родителя нового узла.
+        :param go_left: Присоединять ли узел левым потомком.
+        :param new_node: Новый узел.
+        """
+        path = self._own_path(path)
+        self._len += new_node.count
+        self._version += 1
+        if not path:
+            self.root = self._first = self._last = new_node
         else:
-            node.right = self._append(node.right, value)
+            if go_left:
+                path[-1].left = new_node
+            else:
+                path[-1].right = new_node
+            # повороты не меняют узлы, поэтому кэш крайних узлов достаточно сдвинуть здесь
+            if self._first is not None and new_node.key < self._first.key:
+                self._first = new_node
+            if self._last is not None and not new_node.key < self._last.key:
+                self._last = new_node
+            self._rebalance_path(path)
+
+        if self.stats is not None:
+            self._count(len(path), 2 * len(path) if self.rewrite else len(path))
+        if self.trace is not None:
+            self.trace('insert', new_node)
+
+    def _own_path(self, path: list[Node]) -> list[Node]:
+        """Подготовка пути спуска к изменению.
+
+        Обычное дерево изменяет узлы пути на месте; :class:`PersistentAVLTree` подменяет их копиями.
+
+        :param path: Цепочка узлов от корня, в которой каждый следующий узел - потомок предыдущего.
+        :return: Возвращает цепочку узлов, которые можно изменять.
+        """
+        return path
+
+    @staticmethod
+    def _new_node(key: Any, value: Any) -> Node:
+        """Создание узла для добавляемого объекта.
+
+        :param key: Ключ объекта.
+        :param value: Добавляемый объект.
+        :return: Возвращает новый узел.
+        """
+        return Node(value, key)
+
+    @staticmethod
+    def _rewrite(node: Node, key: Any, value: Any) -> None:
+        """Перезапись узла объектом с равным ключом.
+
+        :param node: Перезаписываемый узел.
+        :param key: Ключ нового объекта.
+        :param value: Новый объект.
+        """
+        node.data = value
+        node.key = key
+
+    def _count(self, visited: int, comparisons: int) -> None:
+        """Учет завершенной операции в статистике дерева.
+
+        :param visited: Количество пройденных узлов.
+        :param comparisons: Количество сравнений ключей.
+        """
+        stats = self.stats
+        stats.visited += visited
+        stats.comparisons += comparisons
+        if self.root is not None and self.root.height > stats.max_height:
+            stats.max_height = self.root.height
 
-        return self._balance(node)
+    def _rebalance_path(self, path: list[Node]) -> None:
+        """Обновление высот и размеров поддеревьев и балансировка узлов пути снизу вверх.
+
+        :param path: Путь от корня до родителя измененного узла.
+        """
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            left, right = node.left, node.right
+            if left is None:
+                left_height = left_size = 0
+            else:
+                left_height, left_size = left.height, left.size
+            if right is None:
+                right_height = right_size = 0
+            else:
+                right_height, right_size = right.height, right.size
+            if -1 <= left_height - right_height <= 1:
+                node.height = 1 + (left_height if left_height > right_height else right_height)
+                node.size = node.count + left_size + right_size
+                node.digest = None
+                continue
+
+            balanced = self._balance(node)
+            if i == 0:
+                self.root = balanced
+            elif path[i - 1].left is node:
+                path[i - 1].left = balanced
+            else:
+                path[i - 1].right = balanced
 
     def _balance(self, node: Node) -> Node:
         """Балансировка дерева
@@ -84,35 +451,52 @@ class AVLTree:
         :param node: Узел дерева.
         :return: Возвращает узел ``node`` со сбалансированными ветвями.
         """
-        self._update_height(node)
+        self._update(node)
         bf = self._balance_factor(node)
 
         # левый перекос
         if bf > 1:
-            if self._balance_factor(node.left) < 0:
-                logging.info("Левый поворот узла {}".format(node.left))
+            double = self._balance_factor(node.left) < 0
+            if double:
                 node.left = self._rotate_left(node.left)  # большой правый поворот
-            logging.info("Правый поворот узла {}".format(node))
+            if self.stats is not None or self.trace is not None:
+                self._count_rotation('rotate_left_right' if double else 'rotate_right', node)
             return self._rotate_right(node)
 
         # правый перекос
         if bf < -1:
-            if self._balance_factor(node.right) > 0:
-                logging.info("Правый поворот узла {}".format(node.right))
+            double = self._balance_factor(node.right) > 0
+            if double:
                 node.right = self._rotate_right(node.right)  # большой левый поворот
-            logging.info("Левый поворот узла {}".format(node))
+            if self.stats is not None or self.trace is not None:
+                self._count_rotation('rotate_right_left' if double else 'rotate_left', node)
             return self._rotate_left(node)
 
         return node
 
-    def _update_height(self, node: Optional[Node]) -> None:
-        """Обновление высоты узла
+    def _count_rotation(self, event: str, node: Node) -> None:
+        """Учет поворота в статистике и передача события в ``trace``.
+
+        :param event: Вид поворота.
+        :param node: Поворачиваемый узел.
+        """
+        if self.stats is not None:
+            if event in ('rotate_left', 'rotate_right'):
+                self.stats.rotations += 1
+            else:
+                self.stats.double_rotations += 1
+        if self.trace is not None:
+            self.trace(event, node)
+
+    def _update(self, node: Optional[Node]) -> None:
+        """Обновление высоты узла и размера его поддерева, сброс дайджеста
 
         :param node: Обновляемый узел.
         """
-        if node:
-            height = 1 + max(self._height(node.left), self._height(node.right))
-            node.height = height
+        if node is not None:
+            node.height = 1 + max(self._height(node.left), self._height(node.right))
+            node.size = node.count + self._size(node.left) + self._size(node.right)
+            node.digest = None
 
     @staticmethod
     def _height(node: Optional[Node]) -> int:
@@ -121,7 +505,16 @@ class AVLTree:
         :param node: Узел дерева.
         :return: Возвращает сохраненную высоту узла. Если узел не создан - возвращает 0.
         """
-        return node.height if node else 0
+        return node.height if node is not None else 0
+
+    @staticmethod
+    def _size(node: Optional[Node]) -> int:
+        """Количество узлов в поддереве.
+
+        :param node: Узел дерева.
+        :return: Возвращает сохраненный размер поддерева. Если узел не создан - возвращает 0.
+        """
+        return node.size if node is not None else 0
 
     def _balance_factor(self, node: Optional[Node]) -> int:
         """Разница между высотой левого и правого поддерева у конкретного узла.
@@ -143,8 +536,8 @@ class AVLTree:
         new_parent.left = parent
         parent.right = sub_branch
 
-        self._update_height(parent)
-        self._update_height(new_parent)
+        self._update(parent)
+        self._update(new_parent)
 
         return new_parent
 
@@ -160,92 +553,916 @@ class AVLTree:
         new_parent.right = parent
         parent.left = sub_branch
 
-        self._update_height(parent)
-        self._update_height(new_parent)
+        self._update(parent)
+        self._update(new_parent)
 
         return new_parent
 
     def delete(self, value: Any) -> None:
         """Удалить объект из дерева.
 
+        При заданном ``key`` удаляется объект с тем же ключом, что и у ``value``.
+
         :param value: Объект для удаления из дерева
         """
-        self.root = self._delete(self.root, value)
+        self._delete(value if self.key is None else self.key(value))
 
-    def _delete(self, node: Optional[Node], value: Any) -> Node:
-        """Рекурсивная функция удаления узла из дерева по введенному значению.
+    def _delete(self, key: Any) -> Node:
+        """Итеративное удаление узла из дерева по ключу.
 
-        :param node: Проверяемый узел.
-        :param value: Значение для удаления из дерева.
-        :return: Возвращает перезаписанный (корневой) узел ``node``.
+        :param key: Ключ удаляемого значения.
+        :raise ValueError: Значение не найдено.
+        :return: Возвращает отсоединенный узел удаленного объекта.
         """
-        if node is None:
-            raise ValueError(f'value {value} is not in {self}')
+        node = self.root
+        path = []
+        while node is not None:
+            if key < node.key:
+                path.append(node)
+                node = node.left
+            elif node.key < key:
+                path.append(node)
+                node = node.right
+            else:
+                break
+        else:
+            raise ValueError(f'value {key} is not in {self}')
+
+        comparisons = 0
+        if self.stats is not None:
+            # шаг влево стоит одного сравнения, шаг вправо и совпадение - двух
+            children = path[1:] + [node]
+            comparisons = 2 + sum(1 if parent.left is child else 2 for parent, child in zip(path, children))
+        return self._unlink(path, node, comparisons)
+
+    def _unlink(self, path: list[Node], node: Node, comparisons: int = 0) -> Node:
+        """Отсоединение узла, до которого уже известен путь от корня.
+
+        Узел с двумя потомками не перезаписывается, а заменяется в дереве своим преемником,
+        поэтому узлы остальных объектов остаются прежними.
 
-        if value < node.data:
-            node.left = self._delete(node.left, value)
-        elif value > node.data:
-            node.right = self._delete(node.right, value)
+        :param path: Путь от корня до родителя узла.
+        :param node: Удаляемый узел.
+        :param comparisons: Количество сравнений, потраченных на поиск узла (для статистики).
+        :return: Возвращает отсоединенный узел.
+        """
+        depth = len(path)
+        if self.trace is not None:
+            self.trace('delete', node)
+
+        if node.left is not None and node.right is not None:
+            # место узла занимает минимальный узел правого поддерева
+            successor_path = []
+            successor = node.right
+            while successor.left is not None:
+                successor_path.append(successor)
+                successor = successor.left
+            owned = self._own_path(path + [node] + successor_path + [successor])
+            path, node, successor_path, successor = owned[:depth], owned[depth], owned[depth + 1:-1], owned[-1]
+            if successor_path:
+                successor_path[-1].left = successor.right
+                successor.right = node.right
+            successor.left = node.left
+            replacement = successor
+            successor_path.insert(0, successor)
         else:
             # узел с одним ребенком
-            if not node.left:
-                return node.right
-            elif not node.right:
-                return node.left
+            owned = self._own_path(path + [node])
+            path, node = owned[:depth], owned[depth]
+            replacement = node.left if node.left is not None else node.right
+            successor_path = []
+        node.left = node.right = None
+        self._len -= node.count
+        self._version += 1
+
+        if not path:
+            self.root = replacement
+        elif path[-1].left is node:
+            path[-1].left = replacement
+        else:
+            path[-1].right = replacement
+        self._shift_ends(node, replacement, path[-1] if path else None)
+        path.extend(successor_path)
+        if path:
+            self._rebalance_path(path)
+
+        if self.stats is not None:
+            self._count(len(path) + 1, comparisons)
+        return node
+
+    def _decrement(self, path: list[Node], node: Node) -> Node:
+        """Уменьшение на единицу кратности узла мультимножества, до которого известен путь.
 
-            # замена найденного значения минимальным значением из правого поддерева
-            new_node = self._min_value_node(node.right)
-            node.data = new_node.data
-            logging.info("Удаление значения {0}. Замена {0} на {1}".format(value, node.data))
-            node.right = self._delete(node.right, node.data)
-            self._len -= 1
+        :param path: Путь от корня до родителя узла.
+        :param node: Узел с кратностью больше единицы.
+        :return: Возвращает узел.
+        """
+        if self.trace is not None:
+            self.trace('delete', node)
+        owned = self._own_path(path + [node])
+        node = owned[-1]
+        node.count -= 1
+        self._len -= 1
+        self._version += 1
+        self._rebalance_path(owned)
+        if self.stats is not None:
+            self._count(len(owned), 0)
+        return node
 
-        return self._balance(node)
+    def _shift_ends(self, node: Node, replacement: Optional[Node], parent: Optional[Node]) -> None:
+        """Обновление кэша крайних узлов после отсоединения узла.
 
-    def __contains__(self, item: Any) -> bool:
-        """Поиск объекта/значения в дереве.
+        Крайний узел имеет не более одного потомка, поэтому новым крайним узлом становится
+        крайний узел заменившего его поддерева или, если поддерева нет, бывший родитель.
 
-        :param item: Объект/значение для поиска.
-        :return: Возвращает ``True`` при наличии объекта в дереве, иначе возвращает ``False``.
+        :param node: Отсоединенный узел.
+        :param replacement: Поддерево, занявшее место узла.
+        :param parent: Бывший родитель узла.
         """
-        try:
-            self._find_value(self.root, item)
-            return True
-        except ValueError:
-            return False
+        if node is self._first:
+            self._first = parent if replacement is None else self._min_value_node(replacement)
+        if node is self._last:
+            self._last = parent if replacement is None else self._max_value_node(replacement)
 
-    def _find_value(self, node: Optional[Node], value: Any) -> Node:
-        """Рекурсивный поиск объекта/значения в дереве.
+    def pop_min(self) -> Any:
+        """Удаление наименьшего объекта.
 
-        :param node: Узел, в котором осуществляется поиск.
-        :param value: Объект/значение для поиска.
-        :raise ValueError: Значение не найдено.
-        :return: Узел ``node`` с необходимым значением.
+        :raise IndexError: Дерево пусто.
+        :return: Возвращает удаленный объект.
+        """
+        return self._pop_end(last=False).data
+
+    def pop_max(self) -> Any:
+        """Удаление наибольшего объекта.
+
+        :raise IndexError: Дерево пусто.
+        :return: Возвращает удаленный объект.
+        """
+        return self._pop_end(last=True).data
+
+    def peek_min(self) -> Any:
+        """Наименьший объект за O(1) без удаления.
+
+        :raise IndexError: Дерево пусто.
+        """
+        if self.root is None:
+            raise IndexError(f'peek from empty {type(self).__name__}')
+        return self._first_node().data
+
+    def peek_max(self) -> Any:
+        """Наибольший объект за O(1) без удаления.
+
+        :raise IndexError: Дерево пусто.
         """
+        if self.root is None:
+            raise IndexError(f'peek from empty {type(self).__name__}')
+        return self._last_node().data
+
+    def _pop_end(self, last: bool) -> Node:
+        """Удаление крайнего узла за один спуск по крайней ветви.
+
+        Крайний узел не имеет потомка с внешней стороны, поэтому его место занимает
+        единственный внутренний потомок без поиска преемника. Узел мультимножества
+        с кратностью больше единицы остается в дереве, уменьшается только кратность.
+
+        :param last: Удалять наибольший узел, иначе - наименьший.
+        :raise IndexError: Дерево пусто.
+        :return: Возвращает удаленный узел.
+        """
+        node = self.root
         if node is None:
-            raise ValueError(f'value {value} is not in {self}')
+            raise IndexError(f'pop from empty {type(self).__name__}')
+        path = []
+        child = node.right if last else node.left
+        while child is not None:
+            path.append(node)
+            node = child
+            child = node.right if last else node.left
+
+        if node.count > 1:
+            return self._decrement(path, node)
+        return self._unlink(path, node)
+
+    def __contains__(self, item: Any) -> bool:
+        """Поиск по ключу в дереве.
+
+        Сравниваются только сохраненные в узлах ключи; при заданном ``key`` ищется ключ, а не объект.
+
+        :param item: Ключ (без ``key`` - сам объект/значение) для поиска.
+        :return: Возвращает ``True`` при наличии ключа в дереве, иначе возвращает ``False``.
+        """
+        if self.stats is not None:
+            return self._find_node_counted(item) is not None
+        return self._find_node(item) is not None
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Поиск объекта по ключу.
+
+        :param key: Ключ для поиска.
+        :param default: Значение, возвращаемое при отсутствии ключа.
+        :return: Возвращает объект с ключом ``key`` или ``default``.
+        """
+        node = self._find_node(key) if self.stats is None else self._find_node_counted(key)
+        return default if node is None else node.data
+
+    def _find_node(self, key: Any) -> Optional[Node]:
+        """Итеративный поиск узла по ключу.
+
+        :param key: Ключ для поиска.
+        :return: Узел ``node`` с необходимым ключом или ``None``.
+        """
+        node = self.root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def _find_node_counted(self, key: Any) -> Optional[Node]:
+        """Поиск узла по ключу с учетом пройденных узлов и сравнений в статистике.
+
+        :param key: Ключ для поиска.
+        :return: Узел ``node`` с необходимым ключом или ``None``.
+        """
+        node = self.root
+        visited = comparisons = 0
+        while node is not None:
+            visited += 1
+            comparisons += 1
+            if key < node.key:
+                node = node.left
+                continue
+            comparisons += 1
+            if node.key < key:
+                node = node.right
+            else:
+                break
+        self._count(visited, comparisons)
+        return node
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """Доступ к элементу дерева по порядковому номеру.
+
+        :param index: Номер элемента в порядке возрастания (допускаются отрицательные номера) или срез.
+        :raise IndexError: Номер вне диапазона.
+        :return: Возвращает элемент за O(log n) или список элементов среза за O(log n + k).
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size(self.root))
+            count = len(range(start, stop, step))
+            if not count:
+                return []
+            stack, offset = self._select_path(start, reverse=step < 0)
+            if step > 0:
+                items = self._in_order(None, stack)
+            else:
+                items = self._in_reverse_order(None, stack)
+                offset = stack[-1].count - 1 - offset
+            return list(islice(items, offset, offset + (count - 1) * abs(step) + 1, abs(step)))
+
+        if index == 0 and self.root is not None:
+            return self._first_node().data
+        if index == -1 and self.root is not None:
+            return self._last_node().data
+        return self.select(index)
+
+    def select(self, k: int) -> Any:
+        """Поиск k-го по возрастанию элемента дерева.
+
+        :param k: Номер элемента, начиная с 0 (допускаются отрицательные номера).
+        :raise IndexError: Номер вне диапазона.
+        :return: Возвращает найденный элемент.
+        """
+        stack, _ = self._select_path(k, reverse=False)
+        return stack[-1].data
+
+    def _select_path(self, k: int, reverse: bool) -> tuple[list[Node], int]:
+        """Спуск к узлу k-го по возрастанию элемента.
+
+        :param k: Номер элемента, начиная с 0 (допускаются отрицательные номера).
+        :param reverse: Собирать предков, из которых спуск шел вправо, вместо предков, из которых
+            спуск шел влево.
+        :raise IndexError: Номер вне диапазона.
+        :return: Возвращает стек обхода (предков, которые еще предстоит посетить, и сам узел последним)
+            и номер элемента среди повторов узла.
+        """
+        size = self._size(self.root)
+        if k < 0:
+            k += size
+        if not 0 <= k < size:
+            raise IndexError(f'{type(self).__name__} index out of range')
+
+        node = self.root
+        stack = []
+        while True:
+            left_size = node.left.size if node.left is not None else 0
+            if k < left_size:
+                if not reverse:
+                    stack.append(node)
+                node = node.left
+            elif k >= left_size + node.count:
+                if reverse:
+                    stack.append(node)
+                k -= left_size + node.count
+                node = node.right
+            else:
+                stack.append(node)
+                return stack, k - left_size
+
+    def rank(self, value: Any) -> int:
+        """Количество элементов дерева с ключом, меньшим ``value``.
+
+        :param value: Ключ для сравнения.
+        :return: Возвращает позицию, на которую встал бы ``value`` в отсортированной последовательности.
+        """
+        return self.bisect_left(value)
+
+    def bisect_left(self, value: Any) -> int:
+        """Позиция вставки ключа ``value`` перед всеми равными ему ключами (аналог ``bisect.bisect_left``).
+
+        :param value: Ключ для сравнения.
+        :return: Возвращает количество элементов с ключом, меньшим ``value``.
+        """
+        node = self.root
+        rank = 0
+        while node is not None:
+            if node.key < value:
+                rank += node.count + (node.left.size if node.left is not None else 0)
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def bisect_right(self, value: Any) -> int:
+        """Позиция вставки ключа ``value`` после всех равных ему ключей (аналог ``bisect.bisect_right``).
+
+        :param value: Ключ для сравнения.
+        :return: Возвращает количество элементов с ключом, не большим ``value``.
+        """
+        node = self.root
+        rank = 0
+        while node is not None:
+            if value < node.key:
+                node = node.left
+            else:
+                rank += node.count + (node.left.size if node.left is not None else 0)
+                node = node.right
+        return rank
+
+    def contains_many(self, keys: Iterable) -> Union[list[bool], "numpy.ndarray"]:
+        """Пакетная проверка наличия ключей.
+
+        :param keys: Последовательность ключей или одномерный массив NumPy.
+        :return: Возвращает список флагов наличия (для массива NumPy - массив ``bool``).
+        """
+        probes, as_array = self._probes(keys)
+        view = self._batch_view(len(probes))
+        if view is None:
+            result = [self._find_node(key) is not None for key in self._scalars(probes, as_array)]
+        else:
+            _, tree_keys, _, _, arrays = view
+            positions = self._batch_positions(view, probes, as_array)
+            if as_array and not isinstance(positions, list):
+                tree_array = arrays['keys']
+                found = positions < len(tree_keys)
+                found[found] = tree_array[positions[found]] == probes[found]
+                return found
+            n = len(tree_keys)
+            result = [i < n and not key < tree_keys[i] for key, i in zip(self._scalars(probes, as_array), positions)]
+        return numpy.array(result, dtype=bool) if as_array else result
+
+    def get_many(self, keys: Iterable, default: Any = None) -> list:
+        """Пакетный поиск объектов по ключам (для отображения - значений).
+
+        :param keys: Последовательность ключей или одномерный массив NumPy.
+        :param default: Значение для отсутствующих ключей.
+        :return: Возвращает список найденных объектов.
+        """
+        probes, as_array = self._probes(keys)
+        view = self._batch_view(len(probes))
+        if view is None:
+            return [self.get(key, default) for key in self._scalars(probes, as_array)]
+
+        _, tree_keys, elements, _, _ = view
+        positions = self._batch_positions(view, probes, as_array)
+        if not isinstance(positions, list):
+            positions = positions.tolist()
+        n = len(tree_keys)
+        return [elements[i] if i < n and not key < tree_keys[i] else default
+                for key, i in zip(self._scalars(probes, as_array), positions)]
+
+    def rank_many(self, keys: Iterable) -> Union[list[int], "numpy.ndarray"]:
+        """Пакетный расчет :meth:`rank`.
+
+        :param keys: Последовательность ключей или одномерный массив NumPy.
+        :return: Возвращает список рангов (для массива NumPy - массив ``intp``).
+        """
+        probes, as_array = self._probes(keys)
+        view = self._batch_view(len(probes))
+        if view is None:
+            result = [self.rank(key) for key in self._scalars(probes, as_array)]
+        else:
+            starts = view[3]
+            positions = self._batch_positions(view, probes, as_array)
+            if not isinstance(positions, list):
+                return positions if starts is None else view[4]['starts'][positions]
+            result = positions if starts is None else [starts[i] for i in positions]
+        return numpy.array(result, dtype=numpy.intp) if as_array else result
 
-        if value < node.data:
-            self._find_value(node.left, value)
-        elif value > node.data:
-            self._find_value(node.right, value)
+    @staticmethod
+    def _probes(keys: Iterable) -> tuple[Any, bool]:
+        """Приведение пакета ключей к списку или одномерному массиву NumPy.
+
+        :return: Возвращает пакет и признак того, что на вход пришел массив NumPy.
+        """
+        if numpy is not None and isinstance(keys, numpy.ndarray):
+            return keys.ravel(), True
+        return keys if isinstance(keys, list) else list(keys), False
+
+    @staticmethod
+    def _scalars(probes: Any, as_array: bool) -> list:
+        """Ключи пакета объектами Python: скаляры NumPy сравнивали бы целые с ``float`` через приведение"""
+        return probes.tolist() if as_array else probes
+
+    def _batch_view(self, batch: int) -> Optional[tuple[int, list, list, Optional[list], dict]]:
+        """Плоское представление дерева для пакета запросов или ``None``, если пакету выгоднее спуски.
+
+        Представление строится за O(n) и живет до следующего изменения дерева. Пока оно не
+        построено, пакет из k ключей дешевле обработать k спусками, если k * log(n) < n.
+
+        :param batch: Размер пакета.
+        Копии в массивах NumPy лежат в самом представлении, а не рядом с ним: читатели
+        :class:`ConcurrentAVLTree`, одновременно перестроившие представление, не смешают его
+        с массивами другого представления.
+
+        :return: Возвращает номер версии дерева, ключи, объекты (у отображения - значения),
+            номера первых экземпляров каждого узла, если у узлов есть кратности, и словарь копий
+            ключей и номеров в массивах NumPy, заполняемый :meth:`_batch_positions`.
+        """
+        view = self._flat
+        if view is not None and view[0] == self._version:
+            return view
+        if batch * self._len.bit_length() < self._len:
+            return None
+
+        keys, elements = [], []
+        for key, element in self._in_order_items(self.root):
+            keys.append(key)
+            elements.append(element)
+        starts = None
+        if len(keys) != self._len:
+            starts = list(accumulate((node.count for node in self._iter_nodes(self.root)), initial=0))
+        self._flat = view = (self._version, keys, elements, starts, {})
+        return view
+
+    def _batch_positions(self, view: tuple, probes: Any, as_array: bool) -> Union[list[int], "numpy.ndarray"]:
+        """Позиции вставки ключей пакета в отсортированные ключи дерева (как у ``bisect_left``).
+
+        Числовые массивы NumPy ищутся ``numpy.searchsorted`` по копии ключей в массиве, если ключи
+        и пакет сравниваются в общем типе точно: оба целые или оба вещественные. Иначе (например,
+        целые ключи больше 2**53 и пакет ``float64``) и для остальных пакетов каждый ключ ищется
+        ``bisect_left`` из C с точным сравнением Python.
+
+        :return: Возвращает массив позиций для числового массива NumPy, иначе - список.
+        """
+        _, keys, _, starts, arrays = view
+        if as_array and probes.dtype.kind in 'biuf':
+            if 'keys' not in arrays:
+                if starts is not None:  # до 'keys': по нему другие читатели считают словарь заполненным
+                    arrays['starts'] = numpy.asarray(starts, dtype=numpy.intp)
+                tree_array = numpy.asarray(keys) if keys else numpy.empty(0, dtype=probes.dtype)
+                arrays['keys'] = tree_array if tree_array.ndim == 1 and tree_array.dtype.kind in 'biuf' else None
+            tree_array = arrays['keys']
+            if tree_array is not None:
+                common = numpy.result_type(tree_array.dtype, probes.dtype)
+                if common.kind in 'biu' or tree_array.dtype.kind == probes.dtype.kind == 'f':
+                    return numpy.searchsorted(tree_array, probes, side='left')
+        if as_array:
+            probes = probes.tolist()
+        return list(map(bisect_left, repeat(keys), probes))
+
+    def floor(self, value: Any) -> Any:
+        """Элемент с наибольшим ключом, не превышающим ``value``.
+
+        :return: Возвращает найденный элемент или ``None``.
+        """
+        node = self.root
+        result = None
+        while node is not None:
+            if value < node.key:
+                node = node.left
+            else:
+                result = node.data
+                node = node.right
+        return result
+
+    def ceiling(self, value: Any) -> Any:
+        """Элемент с наименьшим ключом, не меньшим ``value``.
+
+        :return: Возвращает найденный элемент или ``None``.
+        """
+        node = self.root
+        result = None
+        while node is not None:
+            if node.key < value:
+                node = node.right
+            else:
+                result = node.data
+                node = node.left
+        return result
+
+    def lower(self, value: Any) -> Any:
+        """Элемент с наибольшим ключом, строго меньшим ``value``.
+
+        :return: Возвращает найденный элемент или ``None``.
+        """
+        node = self.root
+        result = None
+        while node is not None:
+            if node.key < value:
+                result = node.data
+                node = node.right
+            else:
+                node = node.left
+        return result
+
+    def higher(self, value: Any) -> Any:
+        """Элемент с наименьшим ключом, строго большим ``value``.
+
+        :return: Возвращает найденный элемент или ``None``.
+        """
+        node = self.root
+        result = None
+        while node is not None:
+            if value < node.key:
+                result = node.data
+                node = node.left
+            else:
+                node = node.right
+        return result
+
+    def seek(self, key: Any = None) -> "AVLTreeCursor":
+        """Курсор на первом элементе с ключом не меньше ``key``.
+
+        :param key: Ключ (без ``key`` у дерева - сам объект); ``None`` - первый элемент дерева.
+        :return: Возвращает курсор; если такого элемента нет, курсор стоит вне дерева.
+        """
+        return AVLTreeCursor(self).seek(key)
+
+    def irange(self,
+               lo: Any = None,
+               hi: Any = None,
+               inclusive: tuple[bool, bool] = (True, False),
+               reverse: bool = False) -> Iterator[Any]:
+        """Ленивый обход элементов из диапазона.
+
+        Спуск сразу идет к начальной границе, обход останавливается после последнего подходящего
+        элемента, поэтому стоимость составляет O(log n + k).
+
+        :param lo: Нижняя граница диапазона (``None`` - без границы).
+        :param hi: Верхняя граница диапазона (``None`` - без границы).
+        :param inclusive: Включать ли в диапазон нижнюю и верхнюю границы.
+        :param reverse: Обход в порядке убывания.
+        :return: Итератор элементов диапазона.
+        """
+        count = self.count_range(lo, hi, inclusive)
+        if reverse:
+            items = self._in_reverse_order(None, self._bound_stack(hi, inclusive[1], reverse=True))
+        else:
+            items = self._in_order(None, self._bound_stack(lo, inclusive[0], reverse=False))
+        return islice(items, count)
+
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: tuple[bool, bool] = (True, False)) -> int:
+        """Количество элементов в диапазоне за O(log n).
+
+        :param lo: Нижняя граница диапазона (``None`` - без границы).
+        :param hi: Верхняя граница диапазона (``None`` - без границы).
+        :param inclusive: Включать ли в диапазон нижнюю и верхнюю границы.
+        :return: Возвращает количество элементов диапазона.
+        """
+        if lo is None:
+            start = 0
+        else:
+            start = self.bisect_left(lo) if inclusive[0] else self.bisect_right(lo)
+        if hi is None:
+            stop = self._size(self.root)
         else:
-            logging.info("Значение {} найдено".format(value))
+            stop = self.bisect_right(hi) if inclusive[1] else self.bisect_left(hi)
+        return max(0, stop - start)
+
+    def _bound_stack(self, bound: Any, inclusive: bool, reverse: bool) -> list[Node]:
+        """Спуск к первому элементу диапазона.
+
+        :param bound: Граница диапазона (``None`` - без границы).
+        :param inclusive: Включать ли границу в диапазон.
+        :param reverse: Граница верхняя и обход идет в порядке убывания.
+        :return: Возвращает стек обхода, вершина которого - первый элемент диапазона.
+        """
+        node = self.root
+        stack = []
+        while node is not None:
+            if bound is None:
+                fits = True
+            elif reverse:
+                fits = not bound < node.key if inclusive else node.key < bound
+            else:
+                fits = not node.key < bound if inclusive else bound < node.key
+
+            if fits:
+                stack.append(node)
+                node = node.right if reverse else node.left
+            else:
+                node = node.left if reverse else node.right
+        return stack
+
+    def split(self, key: Any) -> tuple["AVLTree", "AVLTree"]:
+        """Разрезание дерева по ключу за O(log n).
+
+        Узлы переходят в новые деревья без копирования, исходное дерево становится пустым.
+
+        :param key: Ключ разреза.
+        :return: Возвращает дерево с ключами, меньшими ``key``, и дерево с остальными ключами.
+        """
+        left, right = self._split(self.root, key, inclusive=False)
+        self.clear()
+        return self._spawn(left), self._spawn(right)
+
+    def join(self, other: "AVLTree") -> None:
+        """Присоединение дерева с не меньшими ключами за O(log n).
+
+        Узлы ``other`` переходят в текущее дерево без копирования, ``other`` становится пустым.
+
+        :param other: Дерево, все ключи которого не меньше ключей текущего дерева.
+        :raise ValueError: Диапазоны ключей деревьев пересекаются.
+        """
+        if self.root is not None and other.root is not None:
+            if other._first_node().key < self._last_node().key:
+                raise ValueError(f'keys of {other!r} must not be less than keys of {self!r}')
+        self._set_root(self._join2(self.root, other.root))
+        other.clear()
+
+    def union(self, other: "AVLTree") -> "AVLTree":
+        """Объединение: элементы дерева и элементы ``other`` с ключами, которых нет в дереве.
+
+        :param other: Второе дерево.
+        :return: Возвращает новое дерево.
+        """
+        result = self._spawn(self._copy_subtree(self.root))
+        result.update(other)
+        return result
+
+    def intersection(self, other: "AVLTree") -> "AVLTree":
+        """Пересечение: элементы дерева, ключи которых есть в ``other``.
+
+        :param other: Второе дерево.
+        :return: Возвращает новое дерево.
+        """
+        result = self._spawn(self._copy_subtree(self.root))
+        result.intersection_update(other)
+        return result
+
+    def difference(self, other: "AVLTree") -> "AVLTree":
+        """Разность: элементы дерева, ключей которых нет в ``other``.
+
+        :param other: Второе дерево.
+        :return: Возвращает новое дерево.
+        """
+        result = self._spawn(self._copy_subtree(self.root))
+        result.difference_update(other)
+        return result
+
+    def symmetric_difference(self, other: "AVLTree") -> "AVLTree":
+        """Симметрическая разность: элементы каждого дерева, ключей которых нет в другом.
+
+        :param other: Второе дерево.
+        :return: Возвращает новое дерево.
+        """
+        result = self._spawn(self._copy_subtree(self.root))
+        result.symmetric_difference_update(other)
+        return result
+
+    def update(self, other: "AVLTree") -> None:
+        """Объединение на месте за O(m log(n/m + 1)); копируются только узлы ``other``.
+
+        :param other: Второе дерево (не изменяется).
+        """
+        self._set_root(self._union(self.root, self._copy_subtree(other.root)))
+
+    def intersection_update(self, other: "AVLTree") -> None:
+        """Пересечение на месте за O(m log(n/m + 1)).
+
+        :param other: Второе дерево (не изменяется).
+        """
+        self._set_root(self._intersection(self.root, other.root))
+
+    def difference_update(self, other: "AVLTree") -> None:
+        """Разность на месте за O(m log(n/m + 1)).
+
+        :param other: Второе дерево (не изменяется).
+        """
+        self._set_root(self._difference(self.root, other.root))
+
+    def symmetric_difference_update(self, other: "AVLTree") -> None:
+        """Симметрическая разность на месте.
+
+        :param other: Второе дерево (не изменяется).
+        """
+        missing = self._difference(self._copy_subtree(other.root), self.root)
+        self._set_root(self._union(self._difference(self.root, other.root), missing))
+
+    def __or__(self, other: "AVLTree") -> "AVLTree":
+        return self.union(other)
+
+    def __and__(self, other: "AVLTree") -> "AVLTree":
+        return self.intersection(other)
+
+    def __sub__(self, other: "AVLTree") -> "AVLTree":
+        return self.difference(other)
+
+    def __xor__(self, other: "AVLTree") -> "AVLTree":
+        return self.symmetric_difference(other)
+
+    def __ior__(self, other: "AVLTree") -> "AVLTree":
+        self.update(other)
+        return self
+
+    def __iand__(self, other: "AVLTree") -> "AVLTree":
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other: "AVLTree") -> "AVLTree":
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other: "AVLTree") -> "AVLTree":
+        self.symmetric_difference_update(other)
+        return self
+
+    def _spawn(self, root: Optional[Node]) -> "AVLTree":
+        """Новое дерево с теми же настройками и готовым корнем.
+
+        :param root: Корень нового дерева (узлы должны принадлежать только ему).
+        :return: Возвращает новое дерево.
+        """
+        tree = copy.copy(self)
+        tree.stats = TreeStats() if self.stats is not None else None
+        tree._set_root(root)
+        return tree
+
+    def _set_root(self, root: Optional[Node]) -> None:
+        """Замена корня дерева после операций над поддеревьями"""
+        self.root = root
+        self._len = self._size(root)
+        self._first = self._last = None
+        self._version += 1
+        if self.stats is not None:
+            self._count(0, 0)
+
+    def _copy_subtree(self, node: Optional[Node]) -> Optional[Node]:
+        """Копирование поддерева.
+
+        :param node: Корень копируемого поддерева.
+        :return: Возвращает корень копии.
+        """
+        if node is None:
+            return None
+        new_node = node.copy()
+        new_node.left = self._copy_subtree(node.left)
+        new_node.right = self._copy_subtree(node.right)
+        return new_node
+
+    def _join(self, left: Optional[Node], node: Node, right: Optional[Node]) -> Node:
+        """Соединение двух поддеревьев через средний узел.
+
+        Спуск идет по краю более высокого поддерева до поддерева нужной высоты, поэтому стоимость
+        составляет O(|h(left) - h(right)| + 1).
+
+        :param left: Поддерево с ключами, не большими ключа ``node``.
+        :param node: Средний узел.
+        :param right: Поддерево с ключами, не меньшими ключа ``node``.
+        :return: Возвращает корень сбалансированного поддерева.
+        """
+        left_height, right_height = self._height(left), self._height(right)
+        if left_height > right_height + 1:
+            left.right = self._join(left.right, node, right)
+            return self._balance(left)
+        if right_height > left_height + 1:
+            right.left = self._join(left, node, right.left)
+            return self._balance(right)
+
+        node.left = left
+        node.right = right
+        self._update(node)
+        return node
+
+    def _join2(self, left: Optional[Node], right: Optional[Node]) -> Optional[Node]:
+        """Соединение двух поддеревьев без среднего узла.
+
+        :param left: Поддерево с ключами, не большими ключей ``right``.
+        :param right: Поддерево с ключами, не меньшими ключей ``left``.
+        :return: Возвращает корень сбалансированного поддерева.
+        """
+        if left is None:
+            return right
+        if right is None:
+            return left
+        right, first = self._split_first(right)
+        return self._join(left, first, right)
+
+    def _split_first(self, node: Node) -> tuple[Optional[Node], Node]:
+        """Отделение минимального узла поддерева.
+
+        :param node: Корень поддерева.
+        :return: Возвращает оставшееся поддерево и отделенный узел.
+        """
+        if node.left is None:
+            return node.right, node
+        node.left, first = self._split_first(node.left)
+        return self._balance(node), first
+
+    def _split(self, node: Optional[Node], key: Any, inclusive: bool) -> tuple[Optional[Node], Optional[Node]]:
+        """Разрезание поддерева по ключу.
+
+        :param node: Корень поддерева.
+        :param key: Ключ разреза.
+        :param inclusive: Относить ли ключи, равные ``key``, к левой части.
+        :return: Возвращает левую часть (ключи меньше ``key``, а при ``inclusive`` - не больше)
+            и правую часть.
+        """
+        if node is None:
+            return None, None
+
+        if not key < node.key if inclusive else node.key < key:
+            left, right = self._split(node.right, key, inclusive)
+            return self._join(node.left, node, left), right
+        left, right = self._split(node.left, key, inclusive)
+        return left, self._join(right, node, node.right)
+
+    def _split3(self, node: Optional[Node], key: Any) -> tuple[Optional[Node], Optional[Node], Optional[Node]]:
+        """Разрезание поддерева на части с ключами меньше, равными и больше ``key``"""
+        less, rest = self._split(node, key, inclusive=False)
+        equal, greater = self._split(rest, key, inclusive=True)
+        return less, equal, greater
+
+    def _union(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Объединение двух поддеревьев, принадлежащих дереву; при равных ключах остаются узлы ``node``"""
+        if node is None:
+            return other
+        if other is None:
+            return node
+
+        less, _, greater = self._split3(other, node.key)
+        left, right = node.left, node.right
+        return self._join(self._union(left, less), node, self._union(right, greater))
+
+    def _intersection(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Пересечение поддерева дерева с поддеревом ``other``, которое только читается"""
+        if node is None or other is None:
+            return None
+
+        less, equal, greater = self._split3(node, other.key)
+        left = self._intersection(less, other.left)
+        right = self._intersection(greater, other.right)
+        return self._join2(self._join2(left, equal), right)
+
+    def _difference(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Разность поддерева дерева и поддерева ``other``, которое только читается"""
+        if node is None or other is None:
             return node
 
+        less, _, greater = self._split3(node, other.key)
+        return self._join2(self._difference(less, other.left), self._difference(greater, other.right))
+
     def min_value(self) -> Any:
         """Минимальное значение в дереве.
 
         :return: Возвращает минимальное значение.
         """
-        return self._min_value_node(self.root).data
+        return self._first_node().data
 
     def max_value(self) -> Any:
         """Максимальное значение в дереве.
 
         :return: Возвращает максимальное значение.
         """
-        return self._max_value_node(self.root).data
+        return self._last_node().data
+
+    def _first_node(self) -> Optional[Node]:
+        """Наименьший узел из кэша; после сброса кэша узел ищется спуском от корня"""
+        node = self._first
+        if node is None and self.root is not None:
+            node = self._first = self._min_value_node(self.root)
+        return node
+
+    def _last_node(self) -> Optional[Node]:
+        """Наибольший узел из кэша; после сброса кэша узел ищется спуском от корня"""
+        node = self._last
+        if node is None and self.root is not None:
+            node = self._last = self._max_value_node(self.root)
+        return node
 
     @staticmethod
     def _min_value_node(node: Node) -> Node:
@@ -254,7 +1471,7 @@ class AVLTree:
         :param node: Узел начала поиска.
         :return: Узел ``node`` с минимальным значением.
         """
-        while node.left:
+        while node.left is not None:
             node = node.left
         return node
 
@@ -265,14 +1482,173 @@ class AVLTree:
         :param node: Узел начала поиска.
         :return: Узел ``node`` с максимальным значением.
         """
-        while node.right:
+        while node.right is not None:
             node = node.right
         return node
 
+    def dump(self, path: Union[str, os.PathLike]) -> None:
+        """Сохранение дерева в компактный двоичный снимок с точной формой дерева.
+
+        Узлы нумеруются в порядке возрастания ключей, поэтому столбец ключей в файле отсортирован.
+        За заголовком следуют столбцы: ключи, кратности (только для мультимножества), индексы левых
+        и правых потомков (``-1`` - нет потомка) и высоты.
+
+        :param path: Путь к файлу снимка.
+        :raise TypeError: Дерево хранит не числа (в том числе ``bool``) или использует ``key``/значения отображения.
+        """
+        if self.key is not None or isinstance(self, AVLTreeMap):
+            raise TypeError(f'{type(self).__name__} with keys or values other than numbers cannot be dumped')
+
+        nodes = list(self._iter_nodes(self.root))
+        keys = [node.key for node in nodes]
+        if all(type(key) is int for key in keys):
+            typecode = 'q'
+        elif all(isinstance(key, (int, float)) and not isinstance(key, bool) for key in keys):
+            typecode = 'd'
+        else:
+            raise TypeError('only int and float keys can be dumped')
+
+        index = {id(node): i for i, node in enumerate(nodes)}
+        index[id(None)] = -1
+        columns = [array(typecode, keys)]
+        flags = _SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0
+        if isinstance(self, AVLMultiset):
+            flags |= _SNAPSHOT_COUNTS
+            columns.append(array('q', [node.count for node in nodes]))
+        columns.append(array('i', [index[id(node.left)] for node in nodes]))
+        columns.append(array('i', [index[id(node.right)] for node in nodes]))
+        columns.append(array('b', [node.height for node in nodes]))
+
+        root = index[id(self.root)]
+        with open(path, 'wb') as file:
+            file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, typecode.encode(), flags,
+                                             len(nodes), root, self._len))
+            for column in columns:
+                column.tofile(file)
+
+    @staticmethod
+    def dump_sorted(iterable: Iterable, path: Union[str, os.PathLike], block_size: int = 1 << 16) -> int:
+        """Запись отсортированного потока чисел в снимок идеально сбалансированного дерева без построения узлов.
+
+        Ключи пишутся блоками по мере чтения потока, а форма дерева та же, что у :meth:`_build`:
+        корень отрезка - его середина, поэтому потомки и высоты вычисляются по границам отрезков.
+        Память - O(block_size + log n), поток может не помещаться в память, например результат
+        ``external_sort.external_sort``. Снимок загружается :meth:`load` или :class:`MappedAVLTree`.
+        Запись идет во временный файл ``path + '.tmp'``, который заменяет ``path`` только после
+        успешного завершения; при ошибке потока прежний файл остается нетронутым.
+
+        :param iterable: Неубывающая последовательность ``int`` или ``float``.
+        :param path: Путь к файлу снимка.
+        :param block_size: Количество элементов, записываемых за раз.
+        :raise TypeError: В потоке есть не числа или ``float`` после целочисленного начала.
+        :raise ValueError: Поток не отсортирован.
+        :return: Возвращает количество записанных ключей.
+        """
+        iterator = iter(iterable)
+        first = next(iterator, None)
+        if first is None or type(first) is int:
+            typecode, number = 'q', int
+        elif isinstance(first, (int, float)) and not isinstance(first, bool):
+            typecode, number = 'd', (int, float)
+        else:
+            raise TypeError('only int and float keys can be dumped')
+
+        flags = _SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0
+        temporary = f'{os.fspath(path)}.tmp'  # недописанный снимок не заменяет прежний файл
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(bytes(_SNAPSHOT_HEADER.size))  # заголовок записывается, когда известно число ключей
+                n = 0
+                previous = first
+                iterator = chain([first], iterator) if first is not None else iterator
+                for block in iter(lambda: list(islice(iterator, block_size)), []):
+                    for key in block:
+                        if not isinstance(key, number) or isinstance(key, bool):
+                            raise TypeError(f'cannot dump {type(key).__name__} key into a {typecode!r} column')
+                        if key < previous:
+                            raise ValueError('iterable is not sorted')
+                        previous = key
+                    array(typecode, block).tofile(file)
+                    n += len(block)
+
+                for column, column_type in ((0, 'i'), (1, 'i'), (2, 'b')):
+                    buffer = array(column_type)
+                    for shape in _balanced_shape(n):
+                        buffer.append(shape[column])
+                        if len(buffer) == block_size:
+                            buffer.tofile(file)
+                            del buffer[:]
+                    buffer.tofile(file)
+
+                file.seek(0)
+                file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, typecode.encode(), flags,
+                                                 n, n // 2 if n else -1, n))
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return n
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike], *, mapped: bool = False, **kwargs: Any) -> Any:
+        """Загрузка дерева из снимка, сохраненного :meth:`dump`.
+
+        :param path: Путь к файлу снимка.
+        :param mapped: Не создавать узлы, а отобразить файл в память только для чтения
+            (см. :class:`MappedAVLTree`).
+        :param kwargs: Параметры конструктора дерева.
+        :raise ValueError: Файл не является снимком или снимок мультимножества загружается не в
+            :class:`AVLMultiset`.
+        :raise TypeError: Загрузка в :class:`AVLTreeMap`, который :meth:`dump` не сохраняет, или
+            параметры конструктора вместе с ``mapped=True``.
+        :return: Возвращает дерево той же формы, что и сохраненное.
+        """
+        if issubclass(cls, AVLTreeMap):
+            raise TypeError(f'{cls.__name__} cannot be loaded from a snapshot of numeric keys')
+        if mapped:
+            if kwargs:
+                raise TypeError(f"mapped snapshot does not accept {', '.join(kwargs)}")
+            return MappedAVLTree(path)
+
+        with open(path, 'rb') as file:
+            typecode, flags, n, root, _ = _read_snapshot_header(file.read(_SNAPSHOT_HEADER.size))
+            multiset = issubclass(cls, AVLMultiset)
+            if flags & _SNAPSHOT_COUNTS and not multiset:
+                raise ValueError(f'snapshot {path} holds a multiset')
+
+            swap = (flags & _SNAPSHOT_BIG_ENDIAN) != (_SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0)
+            keys = _read_column(file, typecode, n, swap)
+            counts = _read_column(file, 'q', n, swap) if flags & _SNAPSHOT_COUNTS else None
+            lefts = _read_column(file, 'i', n, swap)
+            rights = _read_column(file, 'i', n, swap)
+            heights = _read_column(file, 'b', n, swap)
+
+        if multiset:
+            nodes = [CountedNode(key, key, 1 if counts is None else counts[i]) for i, key in enumerate(keys)]
+        else:
+            nodes = [Node(key) for key in keys]
+        levels = [[] for _ in range(max(heights, default=0) + 1)]
+        for node, left, right, height in zip(nodes, lefts, rights, heights):
+            node.left = nodes[left] if left != -1 else None
+            node.right = nodes[right] if right != -1 else None
+            node.height = height
+            levels[height].append(node)
+        # размеры поддеревьев вычисляются снизу вверх по уровням высоты
+        for level in levels:
+            for node in level:
+                node.size = node.count + cls._size(node.left) + cls._size(node.right)
+
+        tree = cls(**kwargs)
+        tree._set_root(nodes[root] if root != -1 else None)
+        return tree
+
     def clear(self) -> None:
         """Очистка дерева"""
         self.root = None
         self._len = 0
+        self._first = self._last = None
+        self._version += 1
 
     def print(self) -> None:
         """Удобное отображение дерева в командной строке"""
@@ -291,18 +1667,66 @@ class AVLTree:
 
         :return: ``Generator`` элементов дерева в порядке возрастания.
         """
-        yield from self._in_order(self.root)
+        return self._in_order(self.root)
 
-    def _in_order(self, node: Optional[Node]) -> Generator[Any, None, None]:
-        """Рекурсивный обход элементов дерева в порядке возрастания.
+    @staticmethod
+    def _in_order(node: Optional[Node], stack: Optional[list[Node]] = None) -> Generator[Any, None, None]:
+        """Обход элементов дерева в порядке возрастания с явным стеком.
 
         :param node: Узел начала обхода.
+        :param stack: Начальное состояние стека обхода.
         :return: ``Generator`` элементов дерева в порядке возрастания.
         """
-        if node:
-            yield from self._in_order(node.left)
+        stack = [] if stack is None else stack
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
             yield node.data
-            yield from self._in_order(node.right)
+            node = node.right
+
+    @staticmethod
+    def _iter_nodes(node: Optional[Node],
+                    reverse: bool = False,
+                    stack: Optional[list[Node]] = None) -> Generator[Node, None, None]:
+        """Обход узлов поддерева с явным стеком.
+
+        :param node: Корень поддерева.
+        :param reverse: Обход в порядке убывания.
+        :param stack: Начальное состояние стека обхода.
+        :return: ``Generator`` узлов.
+        """
+        stack = [] if stack is None else stack
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.right if reverse else node.left
+            if not stack:
+                return
+            node = stack.pop()
+            yield node
+            node = node.left if reverse else node.right
+
+    @staticmethod
+    def _in_order_items(node: Optional[Node]) -> Generator[tuple[Any, Any], None, None]:
+        """Обход пар (ключ, элемент) в порядке возрастания с явным стеком.
+
+        :param node: Узел начала обхода.
+        :return: ``Generator`` пар (ключ, элемент).
+        """
+        stack = []
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            yield node.key, node.data
+            node = node.right
 
     def reversed(self) -> Generator[Any, None, None]:
         """Обход элементов дерева в порядке убывания.
@@ -316,22 +1740,138 @@ class AVLTree:
 
         :return: ``Generator`` элементов дерева в порядке убывания.
         """
-        yield from self._in_reverse_order(self.root)
+        return self._in_reverse_order(self.root)
 
-    def _in_reverse_order(self, node: Optional[Node]) -> Generator[Any, None, None]:
-        """Рекурсивный обход элементов дерева в порядке убывания.
+    @staticmethod
+    def _in_reverse_order(node: Optional[Node], stack: Optional[list[Node]] = None) -> Generator[Any, None, None]:
+        """Обход элементов дерева в порядке убывания с явным стеком.
 
         :param node: Узел начала обхода.
+        :param stack: Начальное состояние стека обхода.
         :return: ``Generator`` элементов дерева в порядке убывания.
         """
-        if node:
-            yield from self._in_reverse_order(node.right)
+        stack = [] if stack is None else stack
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.right
+            if not stack:
+                return
+            node = stack.pop()
             yield node.data
-            yield from self._in_reverse_order(node.left)
+            node = node.left
 
     def __hash__(self) -> int:
         return hash(self.root)
 
+    def __eq__(self, other: object) -> bool:
+        """Равенство содержимого деревьев.
+
+        Разные дайджесты сразу означают неравенство. Поддеревья, общие для обоих деревьев
+        (например, у версий :class:`PersistentAVLTree`), пропускаются без обхода, остальные
+        элементы сравниваются по порядку до первого различия.
+        """
+        if not isinstance(other, AVLTree):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        try:
+            if hash(self) != hash(other):
+                return False
+        except TypeError:
+            pass  # объекты без хеша сравниваются только обходом
+        return next(self._diff_nodes(self.root, other.root, trust_digests=False), None) is None
+
+    def diff(self, other: "AVLTree") -> tuple[list, list]:
+        """Различия содержимого двух деревьев в духе сверки реплик по дереву Меркла.
+
+        Оба дерева обходятся по порядку параллельно; если очередные необойденные поддеревья
+        совпадают по размеру и дайджесту, они пропускаются целиком. Поэтому сверка версий
+        с общими узлами или деревьев одинаковой формы стоит O(d log n) для d различий, а не O(n).
+        Совпадение дайджестов принимается без проверки элементов, как и при сверке реплик. Для чисел
+        дайджест выводится из значения, поэтому ложное совпадение возможно только при совпадении
+        64-битных сумм; объекты без хеша (например, значения-списки отображения) сверяются
+        полным обходом.
+
+        :param other: Сравниваемое дерево.
+        :return: Возвращает пару списков: элементы только этого дерева и элементы только
+            ``other`` (с учетом кратностей, по возрастанию; для отображения - пары (ключ, значение)).
+        """
+        trust_digests = True
+        try:
+            hash(self.root), hash(other.root)
+        except TypeError:
+            trust_digests = False  # объекты без хеша: дайджестов нет, сверка идет полным обходом
+        only_self, only_other = [], []
+        for in_self, element in self._diff_nodes(self.root, other.root, trust_digests=trust_digests):
+            (only_self if in_self else only_other).append(element)
+        return only_self, only_other
+
+    @staticmethod
+    def _diff_nodes(node: Optional[Node],
+                    other: Optional[Node],
+                    trust_digests: bool) -> Generator[tuple[bool, Any], None, None]:
+        """Параллельный обход двух поддеревьев с пропуском совпадающих частей.
+
+        Стеки обхода хранят пары (узел, целиком): поддерево целиком раскрывается в левое поддерево,
+        сам узел и правое поддерево только тогда, когда его нельзя пропустить.
+
+        :param node: Корень первого поддерева.
+        :param other: Корень второго поддерева.
+        :param trust_digests: Пропускать поддеревья с равными размером и дайджестом, а не только общие узлы.
+        :return: ``Generator`` пар (элемент из первого поддерева, элемент) для каждого различия.
+        """
+        def expand(stack: list[tuple[Node, bool]]) -> None:
+            subtree = stack.pop()[0]
+            if subtree.right is not None:
+                stack.append((subtree.right, True))
+            stack.append((subtree, False))
+            if subtree.left is not None:
+                stack.append((subtree.left, True))
+
+        stacks = ([(node, True)] if node is not None else [],
+                  [(other, True)] if other is not None else [])
+        first, second = stacks
+        while first and second:
+            a, a_whole = first[-1]
+            b, b_whole = second[-1]
+            if a_whole and b_whole:
+                if a is b or trust_digests and a.size == b.size > 1 and hash(a) == hash(b):
+                    first.pop()
+                    second.pop()
+                    continue
+                if a.size >= b.size:
+                    expand(first)
+                if b.size >= a.size:
+                    expand(second)
+            elif a_whole:
+                expand(first)
+            elif b_whole:
+                expand(second)
+            elif a.key < b.key:
+                first.pop()
+                yield from zip(repeat(True), repeat(a._element(), a.count))
+            elif b.key < a.key:
+                second.pop()
+                yield from zip(repeat(False), repeat(b._element(), b.count))
+            else:
+                first.pop()
+                second.pop()
+                a_element, b_element = a._element(), b._element()
+                if a_element == b_element:
+                    if a.count != b.count:
+                        yield from zip(repeat(a.count > b.count), repeat(a_element, abs(a.count - b.count)))
+                else:
+                    yield from zip(repeat(True), repeat(a_element, a.count))
+                    yield from zip(repeat(False), repeat(b_element, b.count))
+
+        for in_first, stack in zip((True, False), stacks):
+            while stack:
+                subtree, whole = stack.pop()
+                nodes = AVLTree._iter_nodes(subtree) if whole else (subtree,)
+                for remaining in nodes:
+                    yield from zip(repeat(in_first), repeat(remaining._element(), remaining.count))
+
     def __bool__(self) -> bool:
         return bool(self.root)
 
@@ -345,6 +1885,1544 @@ class AVLTree:
         return f"<{type(self).__name__}({self._len})>"
 
 
+class AVLTreeCursor:
+    """Курсор для последовательного доступа к элементам АВЛ-дерева.
+
+    Курсор хранит путь от корня до текущего узла и для каждого узла пути - индексы ближайших
+    предков, от которых путь повернул вправо и влево. Этого хватает, чтобы шагать к соседям
+    за амортизированное O(1) и начинать поиск не от корня, а от наименьшего общего предка
+    текущего и искомого узлов (finger search): для близких ключей подъем и спуск короткие.
+
+    Любое изменение дерева не через курсор делает курсор недействительным; обращение к нему
+    вызывает ``RuntimeError``, а :meth:`seek` заново спускается от корня. У мультимножества
+    курсор проходит различные объекты. У :class:`AVLTreeMap` шаги возвращают ключи, как обход
+    отображения, а :attr:`value` - значение, сопоставленное ключу под курсором.
+    """
+
+    __slots__ = ('_tree', '_path', '_lo', '_hi', '_version')
+
+    def __init__(self, tree: "AVLTree") -> None:
+        """
+        :param tree: Дерево, по которому перемещается курсор.
+        """
+        self._tree = tree
+        self._path: list[Node] = []  # путь от корня до текущего узла; пустой - курсор вне дерева
+        self._lo: list[int] = []  # индекс ближайшего предка, от которого путь повернул вправо
+        self._hi: list[int] = []  # индекс ближайшего предка, от которого путь повернул влево
+        self._version = tree._version
+
+    @property
+    def value(self) -> Any:
+        """Элемент под курсором; у :class:`AVLTreeMap` - значение, сопоставленное ключу.
+
+        :raise IndexError: Курсор вне дерева.
+        """
+        node = self._node()
+        return node.value if isinstance(node, MapNode) else node.data
+
+    @property
+    def key(self) -> Any:
+        """Ключ элемента под курсором.
+
+        :raise IndexError: Курсор вне дерева.
+        """
+        return self._node().key
+
+    def __bool__(self) -> bool:
+        """Стоит ли курсор на элементе"""
+        self._check()
+        return bool(self._path)
+
+    def _check(self) -> None:
+        """Проверка, что дерево не менялось с момента позиционирования курсора"""
+        if self._version != self._tree._version:
+            raise RuntimeError('tree changed since the cursor was positioned')
+
+    def _node(self) -> Node:
+        """Узел под курсором"""
+        self._check()
+        if not self._path:
+            raise IndexError('cursor is out of range')
+        return self._path[-1]
+
+    def _push(self, node: Node, went_left: bool) -> None:
+        """Добавление потомка последнего узла пути.
+
+        :param node: Потомок.
+        :param went_left: Потомок левый.
+        """
+        parent = len(self._path) - 1
+        if went_left:
+            self._lo.append(self._lo[parent])
+            self._hi.append(parent)
+        else:
+            self._lo.append(parent)
+            self._hi.append(self._hi[parent])
+        self._path.append(node)
+
+    def _truncate(self, length: int) -> None:
+        """Подъем по пути так, чтобы в нем осталось ``length`` узлов"""
+        del self._path[length:], self._lo[length:], self._hi[length:]
+
+    def next(self) -> Any:
+        """Переход к следующему по возрастанию элементу.
+
+        :raise IndexError: Курсор стоит на последнем элементе или вне дерева; курсор не сдвигается.
+        :return: Возвращает новый элемент под курсором.
+        """
+        node = self._node()
+        if node.right is not None:
+            self._push(node.right, went_left=False)
+            node = node.right
+            while node.left is not None:
+                self._push(node.left, went_left=True)
+                node = node.left
+        elif self._hi[-1] == -1:
+            raise IndexError('cursor is at the last element')
+        else:
+            self._truncate(self._hi[-1] + 1)
+        return self._path[-1].data
+
+    def prev(self) -> Any:
+        """Переход к предыдущему по возрастанию элементу.
+
+        :raise IndexError: Курсор стоит на первом элементе или вне дерева; курсор не сдвигается.
+        :return: Возвращает новый элемент под курсором.
+        """
+        node = self._node()
+        if node.left is not None:
+            self._push(node.left, went_left=True)
+            node = node.left
+            while node.right is not None:
+                self._push(node.right, went_left=False)
+                node = node.right
+        elif self._lo[-1] == -1:
+            raise IndexError('cursor is at the first element')
+        else:
+            self._truncate(self._lo[-1] + 1)
+        return self._path[-1].data
+
+    def seek(self, key: Any = None) -> "AVLTreeCursor":
+        """Переход к первому элементу с ключом не меньше ``key``.
+
+        Поиск поднимается по пути до ближайшего предка, поддерево которого может содержать
+        ответ, и спускается от него; если такого элемента нет, курсор выходит за пределы дерева.
+
+        :param key: Ключ (без ``key`` у дерева - сам объект); ``None`` - первый элемент дерева.
+        :return: Возвращает этот же курсор.
+        """
+        path, lo, hi = self._path, self._lo, self._hi
+        if self._version != self._tree._version:
+            self._truncate(0)
+            self._version = self._tree._version
+
+        # поддерево узла i содержит ответ, если все элементы до него меньше key,
+        # а элемент сразу после него (предок hi[i]) не меньше key
+        i = len(path) - 1
+        if key is None:
+            i = min(i, 0)
+        else:
+            while i > 0 and not ((lo[i] == -1 or path[lo[i]].key < key)
+                                 and (hi[i] == -1 or not path[hi[i]].key < key)):
+                i -= 1
+        if i < 0:
+            root = self._tree.root
+            if root is None:
+                return self
+            path.append(root)
+            lo.append(-1)
+            hi.append(-1)
+            i = 0
+        self._truncate(i + 1)
+
+        # спуск к наименьшему ключу не меньше key; ответ - последний узел, от которого путь шел влево
+        found = hi[-1]
+        node = path[-1]
+        while True:
+            go_left = key is None or not node.key < key
+            if go_left:
+                found = len(path) - 1
+            child = node.left if go_left else node.right
+            if child is None:
+                break
+            self._push(child, go_left)
+            node = child
+        self._truncate(found + 1)
+        return self
+
+    def delete_here(self) -> Any:
+        """Удаление элемента под курсором; курсор переходит к следующему элементу.
+
+        :raise IndexError: Курсор вне дерева.
+        :return: Возвращает удаленный элемент.
+        """
+        node = self._node()
+        tree = self._tree
+        # номер узла в порядке обхода; после удаления под этим номером окажется следующий элемент,
+        # а при уменьшении кратности - этот же
+        index = tree._size(node.left)
+        for parent, child in zip(self._path, self._path[1:]):
+            if parent.right is child:
+                index += parent.count + tree._size(parent.left)
+        parents = self._path[:-1]
+
+        if node.count > 1:
+            tree._decrement(parents, node)
+        else:
+            tree._unlink(parents, node)
+        self._version = tree._version
+        self._truncate(0)
+        if index < tree._size(tree.root):
+            self._seek_index(index)
+        return node.data
+
+    def _seek_index(self, index: int) -> None:
+        """Спуск от корня к узлу с заданным номером в порядке обхода"""
+        node = self._tree.root
+        self._path.append(node)
+        self._lo.append(-1)
+        self._hi.append(-1)
+        while True:
+            left_size = self._tree._size(node.left)
+            if index < left_size:
+                node = node.left
+                self._push(node, went_left=True)
+            elif index < left_size + node.count:
+                return
+            else:
+                index -= left_size + node.count
+                node = node.right
+                self._push(node, went_left=False)
+
+    def __repr__(self) -> str:
+        if self._version != self._tree._version:
+            return f"<{type(self).__name__} (invalidated)>"
+        if not self._path:
+            return f"<{type(self).__name__} (out of range)>"
+        return f"<{type(self).__name__} at {self._path[-1].data!r}>"
+
+
+class PersistentAVLTree(AVLTree):
+    """АВЛ-дерево с копированием пути (persistent): узлы никогда не изменяются после создания.
+
+    Каждое изменение копирует O(log n) узлов на пути от корня и при поворотах, остальные узлы
+    разделяются с предыдущими версиями. :meth:`snapshot` за O(1) возвращает версию, которая
+    не меняется при дальнейших изменениях дерева, поэтому ее можно читать из других потоков
+    без блокировок.
+    """
+
+    def snapshot(self) -> "PersistentAVLTree":
+        """Текущая версия дерева за O(1).
+
+        :return: Возвращает независимое дерево, разделяющее все узлы с текущим.
+        """
+        return self._spawn(self.root)
+
+    def _own_path(self, path: list[Node]) -> list[Node]:
+        """Копирование цепочки узлов от корня с перевязкой копий между собой"""
+        self._first = self._last = None  # копии и повороты заменяют узлы, кэш строится заново
+        copies = [node.copy() for node in path]
+        for parent, child, child_copy in zip(copies, path[1:], copies[1:]):
+            if parent.left is child:
+                parent.left = child_copy
+            else:
+                parent.right = child_copy
+        if copies:
+            self.root = copies[0]
+        return copies
+
+    def _rotate_left(self, parent: Node) -> Node:
+        parent = parent.copy()
+        parent.right = parent.right.copy()
+        return super()._rotate_left(parent)
+
+    def _rotate_right(self, parent: Node) -> Node:
+        parent = parent.copy()
+        parent.left = parent.left.copy()
+        return super()._rotate_right(parent)
+
+    def _join(self, left: Optional[Node], node: Node, right: Optional[Node]) -> Node:
+        left_height, right_height = self._height(left), self._height(right)
+        if left_height > right_height + 1:
+            left = left.copy()
+            left.right = self._join(left.right, node, right)
+            return self._balance(left)
+        if right_height > left_height + 1:
+            right = right.copy()
+            right.left = self._join(left, node, right.left)
+            return self._balance(right)
+        return super()._join(left, node.copy(), right)
+
+    def _split_first(self, node: Node) -> tuple[Optional[Node], Node]:
+        if node.left is None:
+            return node.right, node
+        node = node.copy()
+        node.left, first = self._split_first(node.left)
+        return self._balance(node), first
+
+
+class RWLock:
+    """Блокировка читатели-писатель: читатели работают параллельно, писатель - монопольно.
+
+    Ожидающий писатель не пропускает новых читателей вперед, поэтому поток записей не голодает.
+    Блокировка не реентерабельна.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Generator[None, None, None]:
+        """Захват блокировки на чтение"""
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Generator[None, None, None]:
+        """Захват блокировки на запись"""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class ConcurrentAVLTree:
+    """Потокобезопасное АВЛ-дерево.
+
+    Чтения выполняются параллельно под блокировкой :class:`RWLock` на чтение. Изменения из
+    разных потоков ставятся в общую очередь; поток, получивший право применения, забирает
+    всю очередь и применяет ее под блокировкой на запись, объединяя подряд идущие добавления
+    в одну пакетную вставку. Данные хранятся в :class:`PersistentAVLTree`, поэтому итераторы
+    обходят версию дерева, снятую при их создании, и не видят последующих записей.
+
+    Кэш крайних узлов заполняется под блокировкой на запись. Статистика (``stats=True``)
+    приблизительна: параллельные чтения увеличивают ее счетчики без взаимного исключения, и
+    часть приращений может потеряться; записи учитываются точно.
+    """
+
+    def __init__(self, data: Optional[Iterable] = None, **kwargs: Any) -> None:
+        """
+        :param data: Начальная последовательность.
+        :param kwargs: Параметры :class:`PersistentAVLTree` (``key``, ``rewrite``, ``stats``, ``trace``).
+        """
+        self._tree = PersistentAVLTree(data, **kwargs)
+        self._tree._first_node()
+        self._tree._last_node()
+        self._lock = RWLock()
+        self._pending: deque[tuple[str, Any, Future]] = deque()
+        self._combiner = threading.Lock()
+
+    def append(self, value: Any) -> None:
+        """Добавление объекта; возвращает управление после применения записи"""
+        self._submit('append', value)
+
+    add = append
+
+    def insert(self, iterable: Iterable) -> None:
+        """Добавление последовательности одной пакетной вставкой"""
+        self._submit('insert', list(iterable))
+
+    def delete(self, value: Any) -> None:
+        """Удаление объекта.
+
+        :raise ValueError: Объект не найден.
+        """
+        self._submit('delete', value)
+
+    def discard(self, value: Any) -> bool:
+        """Удаление объекта, если он есть.
+
+        :return: Возвращает ``True``, если объект был удален.
+        """
+        return self._submit('discard', value)
+
+    def pop_min(self) -> Any:
+        """Удаление наименьшего объекта.
+
+        :raise IndexError: Дерево пусто.
+        """
+        return self._submit('pop_min', None)
+
+    def pop_max(self) -> Any:
+        """Удаление наибольшего объекта.
+
+        :raise IndexError: Дерево пусто.
+        """
+        return self._submit('pop_max', None)
+
+    def clear(self) -> None:
+        """Очистка дерева"""
+        self._submit('clear', None)
+
+    async def aadd(self, value: Any) -> None:
+        """Добавление объекта без блокировки цикла событий"""
+        await asyncio.get_running_loop().run_in_executor(None, self.append, value)
+
+    async def ainsert(self, iterable: Iterable) -> None:
+        """Добавление последовательности без блокировки цикла событий"""
+        await asyncio.get_running_loop().run_in_executor(None, self.insert, list(iterable))
+
+    async def adelete(self, value: Any) -> None:
+        """Удаление объекта без блокировки цикла событий"""
+        await asyncio.get_running_loop().run_in_executor(None, self.delete, value)
+
+    async def adiscard(self, value: Any) -> bool:
+        """Удаление объекта, если он есть, без блокировки цикла событий"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.discard, value)
+
+    def _submit(self, operation: str, value: Any) -> Any:
+        """Постановка записи в очередь и ожидание ее применения.
+
+        Поток, чья запись еще не применена, сам становится применяющим и разбирает очередь
+        целиком, включая записи других потоков.
+
+        :param operation: Вид записи.
+        :param value: Аргумент записи.
+        :return: Возвращает результат записи.
+        """
+        future = Future()
+        self._pending.append((operation, value, future))
+        while not future.done():
+            with self._combiner:
+                self._apply_pending()
+        return future.result()
+
+    def _apply_pending(self) -> None:
+        """Применение всех накопленных записей под блокировкой на запись"""
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return
+
+        try:
+            with self._lock.write():
+                tree = self._tree
+                for bulk, group in groupby(batch, key=lambda item: item[0] in ('append', 'insert')):
+                    group = list(group)
+                    if bulk and len(group) > 1:
+                        # подряд идущие добавления коммутируют и применяются одной вставкой
+                        values = []
+                        for operation, value, _ in group:
+                            if operation == 'append':
+                                values.append(value)
+                            else:
+                                values.extend(value)
+                        root = tree.root
+                        try:
+                            tree.insert(values)
+                        except Exception:
+                            # узлы неизменяемы: откат за O(1), затем каждая запись применяется отдельно,
+                            # и ошибку получает только поток, передавший неверный объект
+                            tree._set_root(root)
+                        else:
+                            for *_, future in group:
+                                future.set_result(None)
+                            continue
+
+                    for operation, value, future in group:
+                        try:
+                            result = None
+                            if operation == 'append':
+                                tree.append(value)
+                            elif operation == 'insert':
+                                tree.insert(value)
+                            elif operation == 'clear':
+                                tree.clear()
+                            elif operation == 'delete':
+                                tree.delete(value)
+                            elif operation == 'pop_min':
+                                result = tree.pop_min()
+                            elif operation == 'pop_max':
+                                result = tree.pop_max()
+                            else:
+                                result = (value if tree.key is None else tree.key(value)) in tree
+                                if result:
+                                    tree.delete(value)
+                        except Exception as error:
+                            future.set_exception(error)
+                        else:
+                            future.set_result(result)
+
+                # крайние узлы кэшируются под блокировкой на запись: читатели этот кэш только читают
+                tree._first_node()
+                tree._last_node()
+        finally:
+            # прерванное применение (например, KeyboardInterrupt) не оставляет потоки ждать вечно
+            for operation, _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError(f'{operation} was not applied'))
+
+    def snapshot(self) -> PersistentAVLTree:
+        """Неизменяемая версия дерева за O(1)"""
+        with self._lock.read():
+            return self._tree.snapshot()
+
+    def __contains__(self, item: Any) -> bool:
+        with self._lock.read():
+            return item in self._tree
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock.read():
+            return self._tree.get(key, default)
+
+    def min_value(self) -> Any:
+        with self._lock.read():
+            return self._tree.min_value()
+
+    def max_value(self) -> Any:
+        with self._lock.read():
+            return self._tree.max_value()
+
+    def peek_min(self) -> Any:
+        with self._lock.read():
+            return self._tree.peek_min()
+
+    def peek_max(self) -> Any:
+        with self._lock.read():
+            return self._tree.peek_max()
+
+    def rank(self, value: Any) -> int:
+        with self._lock.read():
+            return self._tree.rank(value)
+
+    def contains_many(self, keys: Iterable) -> Union[list[bool], "numpy.ndarray"]:
+        with self._lock.read():
+            return self._tree.contains_many(keys)
+
+    def get_many(self, keys: Iterable, default: Any = None) -> list:
+        with self._lock.read():
+            return self._tree.get_many(keys, default)
+
+    def rank_many(self, keys: Iterable) -> Union[list[int], "numpy.ndarray"]:
+        with self._lock.read():
+            return self._tree.rank_many(keys)
+
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: tuple[bool, bool] = (True, False)) -> int:
+        with self._lock.read():
+            return self._tree.count_range(lo, hi, inclusive)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return self.snapshot()[index]
+        with self._lock.read():
+            return self._tree[index]
+
+    def irange(self,
+               lo: Any = None,
+               hi: Any = None,
+               inclusive: tuple[bool, bool] = (True, False),
+               reverse: bool = False) -> Iterator[Any]:
+        """Ленивый обход диапазона по версии дерева на момент вызова"""
+        return self.snapshot().irange(lo, hi, inclusive, reverse)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.snapshot())
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self.snapshot())
+
+    def __len__(self) -> int:
+        with self._lock.read():
+            return len(self._tree)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __str__(self) -> str:
+        return f"{type(self).__name__}({str(list(self))[1:-1]})"
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}({len(self)})>"
+
+
+_MISSING = object()
+
+
+class AVLTreeMap(AVLTree):
+    """Отсортированное отображение ключ -> значение на основе АВЛ-дерева.
+
+    Значения хранятся прямо в узлах, поэтому поиск слота и его изменение выполняются за один
+    спуск. Обход, индексы и диапазонные запросы :class:`AVLTree` работают с ключами.
+    """
+
+    def __init__(self,
+                 data: Union[Mapping, Iterable[tuple[Any, Any]], None] = None,
+                 *,
+                 stats: bool = False,
+                 trace: Optional[Callable[[str, Node], None]] = None) -> None:
+        """
+        :param data: Отображение или последовательность пар (ключ, значение).
+        :param stats: Вести счетчики :class:`TreeStats`.
+        :param trace: Функция трассировки событий дерева.
+        """
+        super().__init__(rewrite=True, stats=stats, trace=trace)
+        if data:
+            self.update(data)
+
+    def insert(self, iterable: Iterable[tuple[Any, Any]]) -> None:
+        """Добавление последовательности пар (ключ, значение); при повторе ключа остается последнее значение.
+
+        :param iterable: Последовательность пар (ключ, значение).
+        """
+        items = list(iterable)
+        if not items:
+            return
+        items.sort(key=itemgetter(0))
+        self._insert_sorted([key for key, _ in items], [value for _, value in items])
+
+    def append(self, item: tuple[Any, Any]) -> None:
+        """Добавление пары (ключ, значение).
+
+        :param item: Пара (ключ, значение).
+        """
+        key, value = item
+        self._append(key, value)
+
+    def update(self, other: Union[Mapping, Iterable[tuple[Any, Any]]] = (), **kwargs: Any) -> None:
+        """Добавление пар из отображения или последовательности, как ``dict.update``.
+
+        Другое :class:`AVLTreeMap` объединяется через разрезание и соединение за O(m log(n/m + 1)),
+        как в :meth:`AVLTree.update`; при совпадении ключей, как и у ``dict``, остается значение ``other``.
+
+        :param other: Отображение или последовательность пар (ключ, значение).
+        """
+        if isinstance(other, AVLTreeMap):
+            super().update(other)
+        else:
+            self.insert(other.items() if isinstance(other, Mapping) else other)
+        if kwargs:
+            self.insert(kwargs.items())
+
+    def __getitem__(self, key: Any) -> Any:
+        node = self._find_node(key)
+        if node is None:
+            raise KeyError(key)
+        return node.value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._append(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        self.pop(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Значение по ключу.
+
+        :param key: Ключ для поиска.
+        :param default: Значение, возвращаемое при отсутствии ключа.
+        :return: Возвращает значение для ``key`` или ``default``.
+        """
+        node = self._find_node(key) if self.stats is None else self._find_node_counted(key)
+        return default if node is None else node.value
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        """Значение по ключу с добавлением ``default`` при отсутствии ключа (за один спуск).
+
+        :param key: Ключ для поиска.
+        :param default: Добавляемое значение.
+        :return: Возвращает значение для ``key``.
+        """
+        node = self.root
+        path = []
+        go_left = False
+        while node is not None:
+            if key == node.key:
+                return node.value
+            path.append(node)
+            go_left = key < node.key
+            node = node.left if go_left else node.right
+
+        self._attach(path, go_left, self._new_node(key, default))
+        return default
+
+    def pop(self, key: Any, default: Any = _MISSING) -> Any:
+        """Удаление ключа с возвратом его значения.
+
+        :param key: Удаляемый ключ.
+        :param default: Значение, возвращаемое при отсутствии ключа.
+        :raise KeyError: Ключ не найден и ``default`` не задан.
+        :return: Возвращает значение удаленного ключа или ``default``.
+        """
+        try:
+            return self._delete(key).value
+        except ValueError:
+            if default is _MISSING:
+                raise KeyError(key) from None
+            return default
+
+    def popitem(self, last: bool = True) -> tuple[Any, Any]:
+        """Удаление пары с наибольшим (или наименьшим) ключом.
+
+        :param last: Удалять пару с наибольшим ключом, иначе - с наименьшим.
+        :raise KeyError: Отображение пусто.
+        :return: Возвращает удаленную пару (ключ, значение).
+        """
+        if self.root is None:
+            raise KeyError('popitem(): mapping is empty')
+        node = self._pop_end(last)
+        return node.key, node.value
+
+    def keys(self) -> "AVLTreeMapKeysView":
+        """Упорядоченное представление ключей"""
+        return AVLTreeMapKeysView(self)
+
+    def values(self) -> "AVLTreeMapValuesView":
+        """Упорядоченное представление значений"""
+        return AVLTreeMapValuesView(self)
+
+    def items(self) -> "AVLTreeMapItemsView":
+        """Упорядоченное представление пар (ключ, значение)"""
+        return AVLTreeMapItemsView(self)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Mapping) and not isinstance(other, AVLTree):
+            return len(self) == len(other) and all(key in other and other[key] == value
+                                                   for key, value in self.items())
+        return super().__eq__(other)
+
+    __hash__ = AVLTree.__hash__
+
+    def _union(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Объединение поддеревьев; при равных ключах узел ``node`` получает значение из ``other``"""
+        if node is None:
+            return other
+        if other is None:
+            return node
+
+        less, equal, greater = self._split3(other, node.key)
+        if equal is not None:
+            node.value = equal.value
+        return self._join(self._union(node.left, less), node, self._union(node.right, greater))
+
+    @staticmethod
+    def _new_node(key: Any, value: Any) -> MapNode:
+        return MapNode(key, value)
+
+    @staticmethod
+    def _rewrite(node: MapNode, key: Any, value: Any) -> None:
+        node.value = value
+
+    @staticmethod
+    def _in_order_items(node: Optional[Node]) -> Generator[tuple[Any, Any], None, None]:
+        """Обход пар (ключ, значение) в порядке возрастания ключей"""
+        for node in AVLTree._iter_nodes(node):
+            yield node.key, node.value
+
+    def __str__(self) -> str:
+        return f"{type(self).__name__}({{{', '.join(f'{k!r}: {v!r}' for k, v in self.items())}}})"
+
+
+MutableMapping.register(AVLTreeMap)
+
+
+class AVLTreeMapKeysView(KeysView):
+    """Упорядоченное представление ключей :class:`AVLTreeMap`"""
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._mapping)
+
+
+class AVLTreeMapValuesView(ValuesView):
+    """Упорядоченное представление значений :class:`AVLTreeMap`"""
+
+    def __iter__(self) -> Iterator[Any]:
+        for node in AVLTree._iter_nodes(self._mapping.root):
+            yield node.value
+
+    def __reversed__(self) -> Iterator[Any]:
+        for node in AVLTree._iter_nodes(self._mapping.root, reverse=True):
+            yield node.value
+
+
+class AVLTreeMapItemsView(ItemsView):
+    """Упорядоченное представление пар (ключ, значение) :class:`AVLTreeMap`"""
+
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        return AVLTreeMap._in_order_items(self._mapping.root)
+
+    def __reversed__(self) -> Iterator[tuple[Any, Any]]:
+        for node in AVLTree._iter_nodes(self._mapping.root, reverse=True):
+            yield node.key, node.value
+
+
+class CountedNode(Node):
+    """Узел мультимножества, хранящий кратность объекта"""
+
+    __slots__ = ('count',)
+
+    def __init__(self, value: Any, key: Any = None, count: int = 1):
+        super().__init__(value, key)
+        self.count: int = count
+        self.size = count
+
+    def copy(self) -> "CountedNode":
+        """Копия узла с теми же потомками"""
+        node = super().copy()
+        node.count = self.count
+        return node
+
+
+class AVLMultiset(AVLTree):
+    """Мультимножество на основе АВЛ-дерева.
+
+    Каждый различный ключ хранится в одном узле вместе с кратностью, поэтому размер и высота
+    дерева зависят только от количества различных ключей. ``len()``, индексы, ``rank`` и
+    диапазонные запросы учитывают кратности, а обход лениво повторяет каждый объект нужное
+    число раз. Из объектов с равными ключами хранится первый добавленный.
+
+    Операции ``|``, ``&``, ``-`` и ``^`` учитывают кратности, как у ``collections.Counter``:
+    объединение берет наибольшую кратность, пересечение - наименьшую, разность вычитает
+    кратности, а симметрическая разность оставляет модуль их разности.
+    """
+
+    def __init__(self,
+                 data: Optional[Iterable] = None,
+                 *,
+                 key: Optional[Callable] = None,
+                 stats: bool = False,
+                 trace: Optional[Callable[[str, Node], None]] = None) -> None:
+        super().__init__(data, key=key, stats=stats, trace=trace)
+
+    def _insert_sorted(self, keys: list, values: list) -> None:
+        """Добавление отсортированной по ключам последовательности с подсчетом повторов"""
+        groups_keys, groups = [], []
+        for key, value in zip(keys, values):
+            if groups_keys and key == groups_keys[-1]:
+                groups[-1][1] += 1
+            else:
+                groups_keys.append(key)
+                groups.append([value, 1])
+
+        if self.root is not None:
+            if len(groups) * self._len.bit_length() < self._len:
+                for key, (value, count) in zip(groups_keys, groups):
+                    self._add(key, value, count)
+                return
+            merged = heapq.merge(((node.key, [node.data, node.count]) for node in self._iter_nodes(self.root)),
+                                 zip(groups_keys, groups), key=itemgetter(0))
+            groups_keys, groups = [], []
+            for key, group in merged:
+                if groups_keys and key == groups_keys[-1]:
+                    groups[-1][1] += group[1]
+                else:
+                    groups_keys.append(key)
+                    groups.append(group)
+
+        self._set_root(self._build(groups_keys, groups, 0, len(groups)))
+        if self.trace is not None:
+            self.trace('build', self.root)
+
+    @staticmethod
+    def _new_node(key: Any, group: list) -> CountedNode:
+        """Создание узла из пары [объект, кратность]"""
+        value, count = group
+        return CountedNode(value, key, count)
+
+    def append(self, value: Any) -> None:
+        """Добавление одного экземпляра объекта.
+
+        :param value: Добавляемый объект.
+        """
+        self.add(value)
+
+    def add(self, value: Any, n: int = 1) -> None:
+        """Добавление ``n`` экземпляров объекта.
+
+        :param value: Добавляемый объект.
+        :param n: Количество экземпляров.
+        """
+        if n < 1:
+            raise ValueError(f'n must be positive, not {n}')
+        self._add(value if self.key is None else self.key(value), value, n)
+
+    def _add(self, key: Any, value: Any, n: int) -> None:
+        """Увеличение кратности ключа или добавление нового узла за один спуск.
+
+        :param key: Ключ объекта.
+        :param value: Добавляемый объект.
+        :param n: Количество экземпляров.
+        """
+        node = self.root
+        path = []
+        go_left = False
+        while node is not None:
+            path.append(node)
+            if key == node.key:
+                node.count += n
+                self._len += n
+                self._version += 1
+                self._rebalance_path(path)
+                if self.stats is not None:
+                    self._count(len(path), 2 * len(path) - 1)
+                if self.trace is not None:
+                    self.trace('insert', node)
+                return
+            go_left = key < node.key
+            node = node.left if go_left else node.right
+
+        self._attach(path, go_left, CountedNode(value, key, n))
+
+    def delete(self, value: Any) -> None:
+        """Удаление одного экземпляра объекта; узел удаляется, когда кратность становится нулевой.
+
+        :param value: Удаляемый объект.
+        :raise ValueError: Объекта нет в мультимножестве.
+        """
+        if not self.discard(value):
+            raise ValueError(f'value {value} is not in {self!r}')
+
+    def discard(self, value: Any, n: int = 1) -> int:
+        """Удаление до ``n`` экземпляров объекта.
+
+        :param value: Удаляемый объект.
+        :param n: Количество экземпляров.
+        :raise ValueError: ``n`` меньше единицы.
+        :return: Возвращает количество фактически удаленных экземпляров.
+        """
+        if n < 1:
+            raise ValueError(f'n must be positive, not {n}')
+        key = value if self.key is None else self.key(value)
+        node = self.root
+        path = []
+        while node is not None:
+            path.append(node)
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                break
+        else:
+            return 0
+
+        comparisons = 0
+        if self.stats is not None:
+            # шаг влево стоит одного сравнения, шаг вправо и совпадение - двух
+            comparisons = 2 + sum(1 if parent.left is child else 2 for parent, child in zip(path, path[1:]))
+        if node.count <= n:
+            removed = node.count
+            self._unlink(path[:-1], node, comparisons)
+            return removed
+
+        if self.trace is not None:
+            self.trace('delete', node)
+        node.count -= n
+        self._len -= n
+        self._version += 1
+        self._rebalance_path(path)
+        if self.stats is not None:
+            self._count(len(path), comparisons)
+        return n
+
+    def count(self, value: Any) -> int:
+        """Кратность объекта.
+
+        :param value: Объект (при заданном ``key`` - ключ) для поиска.
+        :return: Возвращает количество экземпляров.
+        """
+        node = self._find_node(value)
+        return 0 if node is None else node.count
+
+    def _union(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Объединение поддеревьев с наибольшей из кратностей равных ключей"""
+        if node is None:
+            return other
+        if other is None:
+            return node
+
+        less, equal, greater = self._split3(other, node.key)
+        if equal is not None and equal.count > node.count:
+            node.count = equal.count
+        return self._join(self._union(node.left, less), node, self._union(node.right, greater))
+
+    def _intersection(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Пересечение поддеревьев с наименьшей из кратностей равных ключей"""
+        if node is None or other is None:
+            return None
+
+        less, equal, greater = self._split3(node, other.key)
+        left = self._intersection(less, other.left)
+        right = self._intersection(greater, other.right)
+        if equal is not None and equal.count > other.count:
+            equal.count = other.count
+            self._update(equal)
+        return self._join2(self._join2(left, equal), right)
+
+    def _difference(self, node: Optional[Node], other: Optional[Node]) -> Optional[Node]:
+        """Разность поддеревьев с вычитанием кратностей; узлы с нулевой кратностью удаляются"""
+        if node is None or other is None:
+            return node
+
+        less, equal, greater = self._split3(node, other.key)
+        left = self._difference(less, other.left)
+        right = self._difference(greater, other.right)
+        if equal is None or equal.count <= other.count:
+            return self._join2(left, right)
+        equal.count -= other.count
+        self._update(equal)
+        return self._join2(self._join2(left, equal), right)
+
+    @staticmethod
+    def _in_order(node: Optional[Node], stack: Optional[list[Node]] = None) -> Iterator[Any]:
+        """Обход элементов в порядке возрастания с повтором каждого объекта по его кратности"""
+        return chain.from_iterable(repeat(node.data, node.count) for node in AVLTree._iter_nodes(node, False, stack))
+
+    @staticmethod
+    def _in_reverse_order(node: Optional[Node], stack: Optional[list[Node]] = None) -> Iterator[Any]:
+        """Обход элементов в порядке убывания с повтором каждого объекта по его кратности"""
+        return chain.from_iterable(repeat(node.data, node.count) for node in AVLTree._iter_nodes(node, True, stack))
+
+
+class ArrayAVLTree:
+    """АВЛ-дерево для числовых ключей с хранением узлов в массивах.
+
+    Ключи, индексы потомков и высоты узлов хранятся в отдельных массивах ``array``, ссылки
+    на потомков заменены индексами (``-1`` - отсутствие потомка). Ячейки удаленных узлов
+    связываются в список свободных ячеек через массив левых потомков и используются повторно.
+
+    Это отдельный класс, а не вариант хранения :class:`AVLTree`: он поддерживает только
+    добавление, удаление, поиск, крайние ключи и обход, без ``key``, диагностики, порядковых
+    статистик, диапазонов и операций над множествами.
+    """
+
+    def __init__(self,
+                 data: Optional[Iterable] = None,
+                 *,
+                 typecode: str = 'q',
+                 rewrite: bool = False) -> None:
+        """
+        :param data: Начальная последовательность ключей.
+        :param typecode: Тип ключей в терминах модуля ``array``: ``'q'`` - целые, ``'d'`` - вещественные.
+        :param rewrite: Не добавлять повторяющиеся ключи.
+        """
+        self.typecode = typecode
+        self.rewrite = rewrite
+        self.root: int = -1  # индекс корня дерева
+        self._keys = array(typecode)
+        self._left = array('i')
+        self._right = array('i')
+        self._heights = array('b')
+        self._free: int = -1  # начало списка свободных ячеек
+        self._len: int = 0
+
+        if data:
+            self.insert(data)
+
+    def insert(self, iterable: Iterable) -> None:
+        """Добавление последовательности в дерево.
+
+        Как и в :meth:`AVLTree.insert`, пустое дерево или крупный пакет строится целиком
+        из отсортированной последовательности; ячейки при этом располагаются в порядке ключей.
+
+        :param iterable: Последовательность ключей.
+        """
+        values = list(iterable)
+        if not values:
+            return
+        values.sort()
+
+        if self.root != -1:
+            if len(values) * self._len.bit_length() < self._len:
+                for value in values:
+                    self.append(value)
+                return
+            values = list(heapq.merge(self, values))
+
+        if self.rewrite:
+            values, _ = AVLTree._unique(values, values)
+
+        n = len(values)
+        self._keys = array(self.typecode, values)
+        self._left = array('i', [-1]) * n
+        self._right = array('i', [-1]) * n
+        self._heights = array('b', [1]) * n
+        self._free = -1
+        self._len = n
+        self.root = self._build(0, n)
+
+    def _build(self, lo: int, hi: int) -> int:
+        """Связывание идеально сбалансированного поддерева из отсортированных ячеек ``[lo, hi)``.
+
+        :return: Возвращает индекс корня поддерева.
+        """
+        if lo >= hi:
+            return -1
+
+        mid = (lo + hi) // 2
+        left = self._build(lo, mid)
+        right = self._build(mid + 1, hi)
+        self._left[mid] = left
+        self._right[mid] = right
+        self._heights[mid] = 1 + max(self._height(left), self._height(right))
+        return mid
+
+    def append(self, value: Any) -> None:
+        """Добавление ключа в дерево.
+
+        :param value: Числовой ключ.
+        """
+        keys, left, right = self._keys, self._left, self._right
+        node = self.root
+        path = []
+        go_left = False
+        while node != -1:
+            if self.rewrite and value == keys[node]:
+                return
+            path.append(node)
+            go_left = value < keys[node]
+            node = left[node] if go_left else right[node]
+
+        new_node = self._new_node(value)
+        self._len += 1
+
+        if not path:
+            self.root = new_node
+            return
+        if go_left:
+            left[path[-1]] = new_node
+        else:
+            right[path[-1]] = new_node
+        self._rebalance_path(path)
+
+    def _new_node(self, value: Any) -> int:
+        """Выделение ячейки под новый узел.
+
+        :param value: Ключ узла.
+        :return: Возвращает индекс ячейки.
+        """
+        index = self._free
+        if index == -1:
+            self._keys.append(value)
+            self._left.append(-1)
+            self._right.append(-1)
+            self._heights.append(1)
+            return len(self._keys) - 1
+
+        self._keys[index] = value  # типизированная запись первой: при TypeError список свободных ячеек цел
+        self._free = self._left[index]
+        self._left[index] = -1
+        self._right[index] = -1
+        self._heights[index] = 1
+        return index
+
+    def _free_node(self, index: int) -> None:
+        """Возврат ячейки удаленного узла в список свободных ячеек"""
+        self._left[index] = self._free
+        self._right[index] = -1
+        self._free = index
+
+    def _rebalance_path(self, path: list[int]) -> None:
+        """Обновление высот и балансировка узлов пути снизу вверх.
+
+        :param path: Путь от корня до родителя измененного узла.
+        """
+        left, right, heights = self._left, self._right, self._heights
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            left_height = heights[left[node]] if left[node] != -1 else 0
+            right_height = heights[right[node]] if right[node] != -1 else 0
+            if -1 <= left_height - right_height <= 1:
+                heights[node] = 1 + (left_height if left_height > right_height else right_height)
+                continue
+
+            balanced = self._balance(node)
+            if i == 0:
+                self.root = balanced
+            elif left[path[i - 1]] == node:
+                left[path[i - 1]] = balanced
+            else:
+                right[path[i - 1]] = balanced
+
+    def _height(self, node: int) -> int:
+        """Высота узла; для отсутствующего узла - 0"""
+        return self._heights[node] if node != -1 else 0
+
+    def _update_height(self, node: int) -> None:
+        """Обновление высоты узла"""
+        self._heights[node] = 1 + max(self._height(self._left[node]), self._height(self._right[node]))
+
+    def _balance_factor(self, node: int) -> int:
+        """Разница между высотой левого и правого поддерева узла"""
+        if node == -1:
+            return 0
+        return self._height(self._left[node]) - self._height(self._right[node])
+
+    def _balance(self, node: int) -> int:
+        """Балансировка узла.
+
+        :param node: Индекс узла.
+        :return: Возвращает индекс нового верхнего узла.
+        """
+        self._update_height(node)
+        bf = self._balance_factor(node)
+
+        if bf > 1:
+            if self._balance_factor(self._left[node]) < 0:
+                self._left[node] = self._rotate_left(self._left[node])
+            return self._rotate_right(node)
+
+        if bf < -1:
+            if self._balance_factor(self._right[node]) > 0:
+                self._right[node] = self._rotate_right(self._right[node])
+            return self._rotate_left(node)
+
+        return node
+
+    def _rotate_left(self, parent: int) -> int:
+        """Левый поворот ветви дерева"""
+        new_parent = self._right[parent]
+        self._right[parent] = self._left[new_parent]
+        self._left[new_parent] = parent
+        self._update_height(parent)
+        self._update_height(new_parent)
+        return new_parent
+
+    def _rotate_right(self, parent: int) -> int:
+        """Правый поворот ветви дерева"""
+        new_parent = self._left[parent]
+        self._left[parent] = self._right[new_parent]
+        self._right[new_parent] = parent
+        self._update_height(parent)
+        self._update_height(new_parent)
+        return new_parent
+
+    def delete(self, value: Any) -> None:
+        """Удалить ключ из дерева.
+
+        :param value: Ключ для удаления из дерева.
+        :raise ValueError: Ключ не найден.
+        """
+        keys, left, right = self._keys, self._left, self._right
+        node = self.root
+        path = []
+        while node != -1:
+            if value < keys[node]:
+                path.append(node)
+                node = left[node]
+            elif value > keys[node]:
+                path.append(node)
+                node = right[node]
+            else:
+                break
+        else:
+            raise ValueError(f'value {value} is not in {self!r}')
+
+        if left[node] != -1 and right[node] != -1:
+            # замена найденного ключа минимальным ключом из правого поддерева
+            path.append(node)
+            removed = right[node]
+            while left[removed] != -1:
+                path.append(removed)
+                removed = left[removed]
+            keys[node] = keys[removed]
+            replacement = right[removed]
+        else:
+            removed = node
+            replacement = left[node] if left[node] != -1 else right[node]
+        self._free_node(removed)
+        self._len -= 1
+
+        if not path:
+            self.root = replacement
+            return
+        if left[path[-1]] == removed:
+            left[path[-1]] = replacement
+        else:
+            right[path[-1]] = replacement
+        self._rebalance_path(path)
+
+    def __contains__(self, item: Any) -> bool:
+        """Поиск ключа в дереве.
+
+        :param item: Ключ для поиска.
+        :return: Возвращает ``True`` при наличии ключа в дереве, иначе возвращает ``False``.
+        """
+        keys, left, right = self._keys, self._left, self._right
+        node = self.root
+        while node != -1:
+            if item < keys[node]:
+                node = left[node]
+            elif item > keys[node]:
+                node = right[node]
+            else:
+                return True
+        return False
+
+    def min_value(self) -> Any:
+        """Минимальный ключ в дереве.
+
+        :raise IndexError: Дерево пусто.
+        """
+        if self.root == -1:
+            raise IndexError(f'min_value from empty {type(self).__name__}')
+        node = self.root
+        while self._left[node] != -1:
+            node = self._left[node]
+        return self._keys[node]
+
+    def max_value(self) -> Any:
+        """Максимальный ключ в дереве.
+
+        :raise IndexError: Дерево пусто.
+        """
+        if self.root == -1:
+            raise IndexError(f'max_value from empty {type(self).__name__}')
+        node = self.root
+        while self._right[node] != -1:
+            node = self._right[node]
+        return self._keys[node]
+
+    def clear(self) -> None:
+        """Очистка дерева"""
+        self.root = -1
+        self._keys = array(self.typecode)
+        self._left = array('i')
+        self._right = array('i')
+        self._heights = array('b')
+        self._free = -1
+        self._len = 0
+
+    def __iter__(self) -> Generator[Any, None, None]:
+        """Обход ключей дерева в порядке возрастания"""
+        return self._in_order(self._left, self._right)
+
+    def reversed(self) -> Generator[Any, None, None]:
+        """Обход ключей дерева в порядке убывания"""
+        return self.__reversed__()
+
+    def __reversed__(self) -> Generator[Any, None, None]:
+        """Обход ключей дерева в порядке убывания"""
+        return self._in_order(self._right, self._left)
+
+    def _in_order(self, first: array, second: array) -> Generator[Any, None, None]:
+        """Симметричный обход с явным стеком.
+
+        :param first: Массив потомков, обходимых первыми.
+        :param second: Массив потомков, обходимых последними.
+        :return: ``Generator`` ключей дерева.
+        """
+        keys = self._keys
+        node = self.root
+        stack = []
+        while True:
+            while node != -1:
+                stack.append(node)
+                node = first[node]
+            if not stack:
+                return
+            node = stack.pop()
+            yield keys[node]
+            node = second[node]
+
+    def __bool__(self) -> bool:
+        return self.root != -1
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __str__(self) -> str:
+        return f"{type(self).__name__}({str(list(self))[1:-1]})"
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}({self._len})>"
+
+
+def _read_snapshot_header(header: bytes) -> tuple[str, int, int, int, int]:
+    """Разбор заголовка снимка дерева.
+
+    :param header: Байты заголовка.
+    :raise ValueError: Данные не являются снимком поддерживаемой версии.
+    :return: Возвращает тип ключей, флаги, число узлов, индекс корня и число элементов.
+    """
+    if len(header) != _SNAPSHOT_HEADER.size:
+        raise ValueError('truncated AVL tree snapshot')
+    magic, version, typecode, flags, n, root, total = _SNAPSHOT_HEADER.unpack(header)
+    if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+        raise ValueError('not an AVL tree snapshot')
+    return typecode.decode(), flags, n, root, total
+
+
+def _read_column(file: Any, typecode: str, n: int, swap: bool) -> array:
+    """Чтение столбца снимка.
+
+    :param file: Открытый файл снимка.
+    :param typecode: Тип элементов столбца.
+    :param n: Количество элементов.
+    :param swap: Поменять порядок байтов.
+    :return: Возвращает столбец в виде ``array``.
+    """
+    column = array(typecode)
+    column.fromfile(file, n)
+    if swap:
+        column.byteswap()
+    return column
+
+
+def _balanced_shape(n: int) -> Iterator[tuple[int, int, int]]:
+    """Форма идеально сбалансированного дерева из ``n`` узлов, построенного как :meth:`AVLTree._build`.
+
+    Узлы обходятся по порядку ключей явным стеком отрезков ``[lo, hi)``; корень отрезка - его середина.
+
+    :return: Возвращает для каждого узла индексы левого и правого потомков (``-1`` - нет потомка) и высоту.
+    """
+    stack = []
+    lo, hi = 0, n
+    while stack or lo < hi:
+        while lo < hi:
+            stack.append((lo, hi))
+            hi = (lo + hi) // 2
+        lo, hi = stack.pop()
+        mid = (lo + hi) // 2
+        left = (lo + mid) // 2 if lo < mid else -1
+        right = (mid + 1 + hi) // 2 if mid + 1 < hi else -1
+        yield left, right, (hi - lo).bit_length()
+        lo = mid + 1
+
+
+class MappedAVLTree:
+    """Дерево из снимка :meth:`AVLTree.dump`, отображенного в память только для чтения.
+
+    Узлы не создаются: запросы обслуживаются прямо из столбца отсортированных ключей файла,
+    поэтому процессы, открывшие один снимок, делят его страницы через кэш ОС, а открытие
+    не зависит от размера дерева.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """
+        :param path: Путь к файлу снимка.
+        :raise ValueError: Файл не является снимком, снимок хранит мультимножество или записан
+            с другим порядком байтов.
+        """
+        with open(path, 'rb') as file:
+            typecode, flags, n, _, _ = _read_snapshot_header(file.read(_SNAPSHOT_HEADER.size))
+            if flags & _SNAPSHOT_COUNTS:
+                raise ValueError(f'snapshot {path} holds a multiset and cannot be mapped')
+            if (flags & _SNAPSHOT_BIG_ENDIAN) != (_SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0):
+                raise ValueError(f'snapshot {path} was written with another byte order')
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if n else None
+
+        self.path = path
+        self._len = n
+        start = _SNAPSHOT_HEADER.size
+        self._keys = memoryview(self._mmap)[start:start + n * 8].cast(typecode) if n else memoryview(b'').cast('q')
+
+    def close(self) -> None:
+        """Освобождение отображения файла"""
+        self._keys.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "MappedAVLTree":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __contains__(self, item: Any) -> bool:
+        """Поиск ключа двоичным поиском по столбцу ключей"""
+        i = bisect_left(self._keys, item)
+        return i < self._len and self._keys[i] == item
+
+    def min_value(self) -> Any:
+        """Минимальный ключ"""
+        return self._keys[0]
+
+    def max_value(self) -> Any:
+        """Максимальный ключ"""
+        return self._keys[-1]
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        """Ключ по порядковому номеру или список ключей среза"""
+        if isinstance(index, slice):
+            return self._keys[index].tolist()
+        return self._keys[index]
+
+    def bisect_left(self, value: Any) -> int:
+        """Количество ключей, меньших ``value``"""
+        return bisect_left(self._keys, value)
+
+    def bisect_right(self, value: Any) -> int:
+        """Количество ключей, не больших ``value``"""
+        return bisect_right(self._keys, value)
+
+    rank = bisect_left
+
+    def irange(self,
+               lo: Any = None,
+               hi: Any = None,
+               inclusive: tuple[bool, bool] = (True, False),
+               reverse: bool = False) -> Iterator[Any]:
+        """Ленивый обход ключей из диапазона (параметры как у :meth:`AVLTree.irange`).
+
+        Ключи читаются по индексам, без среза столбца: срез удерживал бы отображение, и
+        :meth:`close` завершался бы ``BufferError``. После закрытия обход прерывается ``ValueError``.
+        """
+        keys = self._keys
+        bounds = self._range(lo, hi, inclusive)
+        indices = range(bounds.start, bounds.stop)
+        return (keys[i] for i in (reversed(indices) if reverse else indices))
+
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: tuple[bool, bool] = (True, False)) -> int:
+        """Количество ключей в диапазоне"""
+        bounds = self._range(lo, hi, inclusive)
+        return max(0, bounds.stop - bounds.start)
+
+    def _range(self, lo: Any, hi: Any, inclusive: tuple[bool, bool]) -> slice:
+        """Срез столбца ключей, соответствующий диапазону"""
+        if lo is None:
+            start = 0
+        else:
+            start = bisect_left(self._keys, lo) if inclusive[0] else bisect_right(self._keys, lo)
+        if hi is None:
+            stop = self._len
+        else:
+            stop = bisect_right(self._keys, hi) if inclusive[1] else bisect_left(self._keys, hi)
+        return slice(start, max(start, stop))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._keys)
+
+    def reversed(self) -> Iterator[Any]:
+        return reversed(self._keys)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._keys)
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __str__(self) -> str:
+        return f"{type(self).__name__}({str(list(self))[1:-1]})"
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}({self._len})>"
+
+
 if __name__ == '__main__':
     import random
 
@@ -362,8 +3440,10 @@ if __name__ == '__main__':
     ]
     random_list = problem_cases[0]
     print('random_list: ', sorted(random_list))
-    r = AVLTree(random_list, rewrite=True)
+    r = AVLTree(random_list, rewrite=True, stats=True,
+                trace=lambda event, node: logging.info("{} {}".format(event, node)))
     print('list_in_tree:', list(r))
     r.print()
     r.delete(-12)
     r.print()
+    print(r.stats)